@@ -1,26 +1,65 @@
+import logging
 import os
 import re
 import base64
-import pickle
 import json
+import sqlite3
+import threading
 import time
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from flask import Flask, request, jsonify
+from html.parser import HTMLParser
 import requests
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+# The Google SDK imports live inside initialize_gmail, next to the only
+# code that uses them. Every worker still pays them at startup: the
+# module-level EmailProcessor() initializes Gmail (and the watch) on
+# import, which push notifications and the sweep thread both rely on.
+
 load_dotenv()
 
+# Hot-path diagnostics go through logging so per-email chatter can be
+# silenced (or enabled with LOG_LEVEL=DEBUG) without touching code.
+logging.basicConfig(
+    level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO),
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Optional C-extension JSON encoder: much faster on the Japanese-heavy
+# payloads we ship to Lark. Falls back to stdlib json when unavailable.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fast body parser for the hot webhook path; both raise ValueError
+# subclasses on bad input.
+_loads = orjson.loads if orjson is not None else json.loads
+
 app = Flask(__name__)
 
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class _OrjsonProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = _OrjsonProvider(app)
+
 # --- Config (from environment) ---
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.modify']
 GMAIL_CREDENTIALS_FILE = os.getenv('GMAIL_CREDENTIALS_FILE', 'credentials.json')
-GMAIL_TOKEN_FILE = os.getenv('GMAIL_TOKEN_FILE', 'token.pickle')
+GMAIL_TOKEN_FILE = os.getenv('GMAIL_TOKEN_FILE', 'token.json')
 
 # Google Cloud Pub/Sub topic for Gmail push notifications
 PUBSUB_TOPIC_NAME = os.getenv('PUBSUB_TOPIC_NAME')  # e.g., "projects/your-project/topics/gmail-topic"
@@ -28,6 +67,25 @@ PUBSUB_TOPIC_NAME = os.getenv('PUBSUB_TOPIC_NAME')  # e.g., "projects/your-proje
 # Your Lark webhook URL
 AUTOMATION_WEBHOOK_URL = 'https://y8xp2r4oy7i.jp.larksuite.com/base/automation/webhook/event/PUAmanwDgwlW3GhK7FyjGFF3pJb'
 
+# Partial-response mask: we only need headers and body data, so don't pull
+# snippets, label ids, size estimates etc. over the wire.
+MESSAGE_FIELDS = 'id,payload(mimeType,headers,body/data,parts)'
+
+# Subject line that marks a registration email
+REGISTRATION_SUBJECT = 'イベントの参加お申し込みがありました'
+
+# Per-second timestamp cache: webhook payloads and status endpoints only
+# need second granularity, so skip a datetime allocation per call.
+_ts_cache = [0, '']
+
+def _now_str():
+    """Current local time as 'YYYY-MM-DD HH:MM:SS', cached per second."""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))
+    return _ts_cache[1]
+
 # --- Helpers for env-to-file convenience ---
 def write_file_from_base64_env(env_var_name, filepath):
     """If env_var present and file missing, write decoded file to filepath."""
@@ -45,24 +103,225 @@ def safe_b64decode(s):
     """URL-safe and padding-safe base64 decode for Gmail data pieces."""
     if not s:
         return b''
-    s = s.replace('-', '+').replace('_', '/')
+    # urlsafe_b64decode handles the -/_ alphabet natively; padding up
+    # front avoids the two full-string .replace() copies per MIME part.
     padding = len(s) % 4
     if padding:
         s += '=' * (4 - padding)
-    try:
-        return base64.b64decode(s)
-    except Exception:
-        return base64.urlsafe_b64decode(s + '===')
+    return base64.urlsafe_b64decode(s)
 
-# Try to write credentials and token from environment (if provided)
+# Try to write credentials from environment (if provided). The token is
+# deliberately not round-tripped through the filesystem: initialize_gmail
+# builds Credentials straight from GMAIL_TOKEN_BASE64.
 write_file_from_base64_env('GMAIL_CREDENTIALS_JSON_BASE64', GMAIL_CREDENTIALS_FILE)
-write_file_from_base64_env('GMAIL_TOKEN_BASE64', GMAIL_TOKEN_FILE)
+
+# --- Email parsing patterns (compiled once at import time) ---
+# Enhanced patterns for better matching
+_PATTERNS = {
+    'event_name': r'イベント名\s*[:：]?\s*([^\n]+?)(?=\n|開催日|$)',
+    'event_date': r'開催日\s*[:：]?\s*([^\n]+?)(?=\n|時間|$)',
+    'event_time': r'時間\s*[:：]?\s*([^\n]+?)(?=\n|会場|$)',
+    'venue': r'会場\s*[:：]?\s*([^\n]+?)(?=\n|URL|$)',
+    'url': r'URL\s*[:：]?\s*(https?://[^\s\n]+)',
+    'reservation_date': r'ご希望日\s*[:：]?\s*([^\n]+?)(?=\n|ご希望時間|$)',
+    'reservation_time': r'ご希望時間\s*[:：]?\s*([^\n]+?)(?=\n|=|$)',
+    'name': r'お名前\s*[:：]?\s*([^\n]+?)(?=\n|フリガナ|$)',
+    'furigana': r'フリガナ\s*[:：]?\s*([^\n]+?)(?=\n|メール|$)',
+    'email': r'メールアドレス\s*[:：]?\s*([^\s\n]+@[^\s\n]+?)(?=\n|電話|$)',
+    'phone': r'電話番号\s*[:：]?\s*(\d+?)(?=\n|年齢|$)',
+    'age': r'年齢\s*[:：]?\s*([^\n]+?)(?=\n|毎月|$)',
+    'monthly_rent': r'毎月の家賃\s*[:：]?\s*([^\n]+?)(?=\n|月々|$)',
+    'monthly_payment': r'月々の返済額\s*[:：]?\s*([^\n]+?)(?=\n|郵便|$)',
+    'postal_code': r'郵便番号\s*[:：]?\s*([^\n]+?)(?=\n|ご住所|$)',
+    'address': r'ご住所\s*[:：]?\s*([^\n]+?)(?=\n|ご意見|$)',
+    'comments': r'ご意見・ご質問等\s*[:：]?\s*([^\n]+?)(?=\n|ご予約のきっかけ|$)',
+    'trigger': r'ご予約のきっかけ\s*[:：]?\s*([^\n]+?)(?=\n|=|取り扱い|$)',
+    'store_name': r'展示場名\s*[:：]?\s*([^\n]+?)(?=\n|所在地|$)',
+    'store_address': r'所在地\s*[:：]?\s*([^\n]+?)(?=\n|営業時間|$)',
+    'business_hours': r'営業時間\s*[:：]?\s*([^\n]+?)(?=\n|定休日|$)',
+    'closed_days': r'定休日\s*[:：]?\s*([^\n]+?)(?=\n|=|$)'
+}
+
+# Fuse all field patterns into one alternation so the body is scanned once
+# instead of 22 times. Each pattern's capture group is renamed to
+# `<key>_v` so the match tells us which field it belongs to.
+# No DOTALL: every capture is newline-bounded, so allowing '.' to cross
+# lines would only reopen backtracking into the rest of the body.
+_COMBINED_PATTERN = re.compile(
+    '|'.join(
+        re.sub(r'\((?!\?)', f'(?P<{key}_v>', pattern, count=1)
+        for key, pattern in _PATTERNS.items()
+    ),
+    re.MULTILINE
+)
+
+# Jump table from capture-group index to field key: m.lastindex is an
+# int, so dispatch is one list index instead of slicing m.lastgroup.
+_COMBINED_KEYS = [None] * (_COMBINED_PATTERN.groups + 1)
+for _name, _idx in _COMBINED_PATTERN.groupindex.items():
+    _COMBINED_KEYS[_idx] = _name[:-2]  # strip the '_v' suffix
+
+# Every field is a fixed Japanese label followed by ':' or '：', so for
+# well-formed (one label per line) emails a plain dict lookup on the
+# line prefix beats the regex engine entirely.
+_LABEL_MAP = {
+    'イベント名': 'event_name',
+    '開催日': 'event_date',
+    '時間': 'event_time',
+    '会場': 'venue',
+    'URL': 'url',
+    'ご希望日': 'reservation_date',
+    'ご希望時間': 'reservation_time',
+    'お名前': 'name',
+    'フリガナ': 'furigana',
+    'メールアドレス': 'email',
+    '電話番号': 'phone',
+    '年齢': 'age',
+    '毎月の家賃': 'monthly_rent',
+    '月々の返済額': 'monthly_payment',
+    '郵便番号': 'postal_code',
+    'ご住所': 'address',
+    'ご意見・ご質問等': 'comments',
+    'ご予約のきっかけ': 'trigger',
+    '展示場名': 'store_name',
+    '所在地': 'store_address',
+    '営業時間': 'business_hours',
+    '定休日': 'closed_days',
+}
+
+class _HtmlTextExtractor(HTMLParser):
+    """Single-pass HTML-to-text scrub for the no-plain-part fallback
+
+    One linear traversal replaces the three whole-body re.sub passes
+    (script, style, generic tags); script/style content is dropped via
+    a nesting counter instead of DOTALL matching.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._chunks.append(data)
+
+    def text(self):
+        return ' '.join(''.join(self._chunks).split())
+
+class ProcessedMessageStore:
+    """Dedup store for handled Gmail message ids
+
+    A bounded in-memory LRU answers the hot membership checks; sqlite
+    (WAL mode, INSERT OR IGNORE) provides the durable backing so a
+    restart or redeploy doesn't re-post every redelivered message to
+    Lark. Supports the same `in` / `.add()` / `len()` surface the old
+    plain set offered.
+    """
+
+    def __init__(self, path='processed_messages.db', max_memory=10000):
+        self._lru = OrderedDict()
+        self._max_memory = max_memory
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS processed (id TEXT PRIMARY KEY, ts INTEGER)')
+        self._db.commit()
+
+    def _remember(self, message_id):
+        self._lru[message_id] = None
+        self._lru.move_to_end(message_id)
+        while len(self._lru) > self._max_memory:
+            self._lru.popitem(last=False)
+
+    def __contains__(self, message_id):
+        with self._lock:
+            if message_id in self._lru:
+                self._lru.move_to_end(message_id)
+                return True
+            row = self._db.execute(
+                'SELECT 1 FROM processed WHERE id = ?', (message_id,)).fetchone()
+            if row:
+                self._remember(message_id)
+            return row is not None
+
+    def add(self, message_id):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR IGNORE INTO processed (id, ts) VALUES (?, ?)',
+                (message_id, int(time.time())))
+            self._db.commit()
+            self._remember(message_id)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM processed').fetchone()[0]
+
+
+@dataclass(slots=True)
+class CustomerData:
+    """Fixed-schema record for one parsed registration email
+
+    Slots keep per-email memory small and make field access plain
+    attribute loads instead of repeated dict hashing.
+    """
+    event_name: str = ""
+    event_date: str = ""
+    event_time: str = ""
+    venue: str = ""
+    url: str = ""
+    reservation_date: str = ""
+    reservation_time: str = ""
+    name: str = ""
+    furigana: str = ""
+    email: str = ""
+    phone: str = ""
+    age: str = ""
+    monthly_rent: str = ""
+    monthly_payment: str = ""
+    postal_code: str = ""
+    address: str = ""
+    comments: str = ""
+    trigger: str = ""
+    store_name: str = ""
+    store_address: str = ""
+    business_hours: str = ""
+    closed_days: str = ""
 
 class EmailProcessor:
     def __init__(self):
         self.gmail_service = None
-        self.processed_messages = set()
+        self.processed_messages = ProcessedMessageStore()
         self.history_id = None
+        # One pooled session for all webhook posts: keep-alive avoids a
+        # fresh TCP+TLS handshake per email, the adapter sizes the pool
+        # for the thread-pool fan-out, and transient 5xx/429 responses
+        # retry with backoff instead of dropping the record.
+        self.webhook_session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=False  # retry POSTs too; webhook is idempotent per message_id
+            )
+        )
+        self.webhook_session.mount('https://', adapter)
+        # Persistent pool for per-message work: creating an executor per
+        # batch paid thread startup/teardown on every notification.
+        self._webhook_pool = ThreadPoolExecutor(max_workers=16)
         print("🔧 Initializing Email Processor...")
         self.initialize_gmail()
         # Load history ID if exists
@@ -70,26 +329,80 @@ class EmailProcessor:
             with open('gmail_history.txt', 'r') as f:
                 self.history_id = f.read().strip()
         # Set up Gmail watch on startup
-        time.sleep(1)
         self.setup_gmail_watch()
 
+    def _save_history_id(self, new_history_id):
+        """Persist the history cursor atomically, skipping no-op writes
+
+        Most notifications advance the cursor, but watch renewals often
+        report the id we already hold; skipping those saves a write per
+        renewal. The tempfile + os.replace dance means a crash mid-write
+        can never leave a truncated cursor behind.
+        """
+        if not new_history_id:
+            return
+        new_history_id = str(new_history_id)
+        if new_history_id == self.history_id:
+            return
+        self.history_id = new_history_id
+        tmp = 'gmail_history.txt.tmp'
+        with open(tmp, 'w') as f:
+            f.write(new_history_id)
+        os.replace(tmp, 'gmail_history.txt')
+
     def initialize_gmail(self):
         """Initialize Gmail API service"""
         print("📧 Setting up Gmail API...")
+        # Imported here rather than at module top to keep the Gmail-only
+        # dependencies grouped with Gmail setup; this still runs once per
+        # worker at startup via the module-level EmailProcessor().
+        import pickle
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from google.auth.transport.requests import Request
+        from googleapiclient.discovery import build
         try:
             creds = None
-            if os.path.exists(GMAIL_TOKEN_FILE):
-                with open(GMAIL_TOKEN_FILE, 'rb') as token:
-                    creds = pickle.load(token)
+            token_b64 = os.getenv('GMAIL_TOKEN_BASE64')
+            if token_b64:
+                # Decode straight into Credentials: no temp file, no
+                # re-read, and nothing secret left on disk.
+                creds = Credentials.from_authorized_user_info(
+                    json.loads(base64.b64decode(token_b64)), SCOPES)
+                print("📄 Loaded token from GMAIL_TOKEN_BASE64")
+            elif os.path.exists(GMAIL_TOKEN_FILE):
+                try:
+                    creds = Credentials.from_authorized_user_file(GMAIL_TOKEN_FILE, SCOPES)
                     print("📄 Loaded token from file")
+                except ValueError:
+                    # Legacy token.pickle from older deployments
+                    with open(GMAIL_TOKEN_FILE, 'rb') as token:
+                        creds = pickle.load(token)
+                    print("📄 Loaded legacy pickle token (will re-save as JSON)")
 
             if not creds or not creds.valid:
                 if creds and creds.expired and creds.refresh_token:
                     print("🔄 Refreshing token...")
-                    creds.refresh(Request())
-                    # Save refreshed token
-                    with open(GMAIL_TOKEN_FILE, 'wb') as token:
-                        pickle.dump(creds, token)
+                    # Serialize the refresh across gunicorn workers: the
+                    # winner refreshes and writes; the rest pick up the
+                    # fresh token from disk instead of each burning a
+                    # round trip to the OAuth endpoint.
+                    import fcntl
+                    with open(GMAIL_TOKEN_FILE + '.lock', 'w') as lock_file:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                        if os.path.exists(GMAIL_TOKEN_FILE):
+                            try:
+                                fresh = Credentials.from_authorized_user_file(
+                                    GMAIL_TOKEN_FILE, SCOPES)
+                                if fresh.valid:
+                                    creds = fresh
+                            except ValueError:
+                                pass
+                        if not creds.valid:
+                            creds.refresh(Request())
+                            # Save refreshed token
+                            with open(GMAIL_TOKEN_FILE, 'w') as token:
+                                token.write(creds.to_json())
                 else:
                     if not os.path.exists(GMAIL_CREDENTIALS_FILE):
                         print("❌ credentials.json not found. Provide GMAIL_CREDENTIALS_JSON_BASE64 or upload credentials.json.")
@@ -97,11 +410,19 @@ class EmailProcessor:
                     print("🌐 Starting OAuth flow...")
                     flow = InstalledAppFlow.from_client_secrets_file(GMAIL_CREDENTIALS_FILE, SCOPES)
                     creds = flow.run_local_server(port=0)
-                    with open(GMAIL_TOKEN_FILE, 'wb') as token:
-                        pickle.dump(creds, token)
-                        print("💾 Saved new token.pickle")
+                    with open(GMAIL_TOKEN_FILE, 'w') as token:
+                        token.write(creds.to_json())
+                        print("💾 Saved new token.json")
 
-            self.gmail_service = build('gmail', 'v1', credentials=creds, cache_discovery=False)
+            # static_discovery builds from the discovery doc bundled with
+            # the client library: no HTTPS fetch of the document at every
+            # worker start. Older client versions lack the kwarg.
+            try:
+                self.gmail_service = build('gmail', 'v1', credentials=creds,
+                                           cache_discovery=False, static_discovery=True)
+            except TypeError:
+                self.gmail_service = build('gmail', 'v1', credentials=creds,
+                                           cache_discovery=False)
             print("✅ Gmail service initialized successfully!")
         except Exception as e:
             print(f"❌ Failed to initialize Gmail: {e}")
@@ -116,25 +437,31 @@ class EmailProcessor:
             print("💡 Without Pub/Sub, the app will still work but won't be instant.")
             return
         
-        try:
-            print("👁️ Setting up Gmail watch for instant notifications...")
-            body = {
-                'topicName': PUBSUB_TOPIC_NAME,
-                'labelIds': ['INBOX'],
-                'labelFilterAction': 'include'
-            }
-            resp = self.gmail_service.users().watch(userId='me', body=body).execute()
-            self.history_id = resp.get('historyId')
-            expiration = resp.get('expiration')
-            print(f"✅ Gmail watch active! (historyId={self.history_id}, expires={expiration})")
-            
-            # Save history ID for future use
-            with open('gmail_history.txt', 'w') as f:
-                f.write(str(self.history_id or ''))
-                
-        except Exception as e:
-            print(f"⚠️  Could not set up Gmail watch: {e}")
-            print("💡 The app will still work but without instant notifications.")
+        print("👁️ Setting up Gmail watch for instant notifications...")
+        body = {
+            'topicName': PUBSUB_TOPIC_NAME,
+            'labelIds': ['INBOX'],
+            'labelFilterAction': 'include'
+        }
+        # Retry with backoff instead of a fixed startup sleep: transient
+        # 429/5xx right after boot get a short exponential wait, anything
+        # else fails fast.
+        for attempt in range(3):
+            try:
+                resp = self.gmail_service.users().watch(userId='me', body=body).execute()
+                expiration = resp.get('expiration')
+                # Save history ID for future use
+                self._save_history_id(resp.get('historyId'))
+                print(f"✅ Gmail watch active! (historyId={self.history_id}, expires={expiration})")
+                return
+            except Exception as e:
+                status = getattr(getattr(e, 'resp', None), 'status', None)
+                if status in (429, 500, 503) and attempt < 2:
+                    time.sleep(0.2 * 2 ** attempt)
+                    continue
+                print(f"⚠️  Could not set up Gmail watch: {e}")
+                print("💡 The app will still work but without instant notifications.")
+                return
 
     def renew_watch(self):
         """Renew Gmail watch (watches expire after 7 days)"""
@@ -143,36 +470,42 @@ class EmailProcessor:
     def _extract_text_from_payload(self, payload):
         """Extract plain text from email payload"""
         collected_plain = []
-        collected_html = []
+        html_data = []
 
-        def walk(part):
+        # Explicit stack instead of recursion: no Python frame per MIME
+        # subpart, and parts without body data are skipped before any
+        # base64 work.
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            subparts = part.get('parts')
+            if subparts:
+                stack.extend(reversed(subparts))
+            data = part.get('body', {}).get('data')
+            if not data:
+                continue
             mime = part.get('mimeType', '')
-            body = part.get('body', {})
-            data = body.get('data')
-            if data:
+            if mime == 'text/plain':
                 try:
-                    decoded = safe_b64decode(data).decode('utf-8', errors='ignore')
+                    collected_plain.append(
+                        safe_b64decode(data).decode('utf-8', errors='ignore'))
                 except Exception:
-                    decoded = ''
-                if mime == 'text/plain':
-                    collected_plain.append(decoded)
-                elif mime == 'text/html':
-                    collected_html.append(decoded)
-            for sub in part.get('parts', []):
-                walk(sub)
-
-        walk(payload)
-        
+                    pass
+            elif mime == 'text/html':
+                # Keep the raw base64; HTML is only decoded (and
+                # scrubbed) when no text/plain part exists.
+                html_data.append(data)
+
         if collected_plain:
             return "\n".join(collected_plain).strip()
-        if collected_html:
-            # Remove HTML tags
-            html_text = "\n".join(collected_html)
-            text = re.sub(r'<script.*?>.*?</script>', '', html_text, flags=re.DOTALL|re.IGNORECASE)
-            text = re.sub(r'<style.*?>.*?</style>', '', text, flags=re.DOTALL|re.IGNORECASE)
-            text = re.sub(r'<[^>]+>', '', text)
-            text = re.sub(r'\s+', ' ', text)
-            return text.strip()
+        if html_data:
+            # Strip markup in one pass; entities are unescaped for free.
+            extractor = _HtmlTextExtractor()
+            for d in html_data:
+                extractor.feed(safe_b64decode(d).decode('utf-8', errors='ignore'))
+                extractor.feed('\n')
+            extractor.close()
+            return extractor.text()
         
         # Sometimes body.data is at top level
         top_data = payload.get('body', {}).get('data')
@@ -190,147 +523,195 @@ class EmailProcessor:
             body_text = self._extract_text_from_payload(payload)
             return body_text
         except Exception as e:
-            print(f"⚠️  Error extracting email body: {e}")
+            logger.warning("⚠️ Error extracting email body: %s", e)
             return ""
 
     def parse_customer_info(self, email_body):
         """Extract customer information from email body"""
+        # Cheap substring prefilter: a body with none of the key labels
+        # (promo mail, plain replies) skips label scan and regex entirely.
+        if 'お名前' not in email_body and 'イベント名' not in email_body:
+            return CustomerData()
+
         # Clean up the email body first
         email_body = email_body.replace('\r', '').strip()
-        
-        # Enhanced patterns for better matching
-        patterns = {
-            'event_name': r'イベント名\s*[:：]?\s*(.+?)(?=\n|開催日|$)',
-            'event_date': r'開催日\s*[:：]?\s*(.+?)(?=\n|時間|$)',
-            'event_time': r'時間\s*[:：]?\s*(.+?)(?=\n|会場|$)',
-            'venue': r'会場\s*[:：]?\s*(.+?)(?=\n|URL|$)',
-            'url': r'URL\s*[:：]?\s*(https?://[^\s\n]+)',
-            'reservation_date': r'ご希望日\s*[:：]?\s*(.+?)(?=\n|ご希望時間|$)',
-            'reservation_time': r'ご希望時間\s*[:：]?\s*(.+?)(?=\n|=|$)',
-            'name': r'お名前\s*[:：]?\s*(.+?)(?=\n|フリガナ|$)',
-            'furigana': r'フリガナ\s*[:：]?\s*(.+?)(?=\n|メール|$)',
-            'email': r'メールアドレス\s*[:：]?\s*([^\s\n]+@[^\s\n]+?)(?=\n|電話|$)',
-            'phone': r'電話番号\s*[:：]?\s*(\d+?)(?=\n|年齢|$)',
-            'age': r'年齢\s*[:：]?\s*(.+?)(?=\n|毎月|$)',
-            'monthly_rent': r'毎月の家賃\s*[:：]?\s*(.+?)(?=\n|月々|$)',
-            'monthly_payment': r'月々の返済額\s*[:：]?\s*(.+?)(?=\n|郵便|$)',
-            'postal_code': r'郵便番号\s*[:：]?\s*(.+?)(?=\n|ご住所|$)',
-            'address': r'ご住所\s*[:：]?\s*(.+?)(?=\n|ご意見|$)',
-            'comments': r'ご意見・ご質問等\s*[:：]?\s*(.+?)(?=\n|ご予約のきっかけ|$)',
-            'trigger': r'ご予約のきっかけ\s*[:：]?\s*(.+?)(?=\n|=|取り扱い|$)',
-            'store_name': r'展示場名\s*[:：]?\s*(.+?)(?=\n|所在地|$)',
-            'store_address': r'所在地\s*[:：]?\s*(.+?)(?=\n|営業時間|$)',
-            'business_hours': r'営業時間\s*[:：]?\s*(.+?)(?=\n|定休日|$)',
-            'closed_days': r'定休日\s*[:：]?\s*(.+?)(?=\n|=|$)'
-        }
 
-        customer_data = {}
-        for key, pattern in patterns.items():
-            m = re.search(pattern, email_body, flags=re.MULTILINE | re.DOTALL)
-            if m and m.group(1):
-                value = m.group(1).strip()
-                # Clean up the value
-                value = re.sub(r'\s+', ' ', value)  # Replace multiple spaces with single space
-                value = value.replace('：', ':').replace('　', ' ')  # Normalize characters
-                customer_data[key] = value
-            else:
-                customer_data[key] = ""
-        
-        print(f"📊 Parsed data: {customer_data.get('name', 'Unknown')} - {customer_data.get('email', 'No email')}")
+        # Fast path: one label per line means we can skip the regex engine
+        # and do a dict lookup on the text before the colon.
+        customer_data = CustomerData()
+        for line in email_body.split('\n'):
+            head, sep, tail = line.partition(':')
+            if not sep or '：' in head:
+                head, sep, tail = line.partition('：')
+            key = _LABEL_MAP.get(head.strip())
+            if key and not getattr(customer_data, key):
+                # str.split handles all Unicode whitespace (incl. 　) in
+                # one C pass: collapses runs and strips the ends.
+                value = ' '.join(tail.split())
+                if value:
+                    setattr(customer_data, key, value.replace('：', ':'))
+        if customer_data.name or customer_data.email:
+            self._log_parse_summary(customer_data)
+            return customer_data
+
+        # Fallback for bodies where labels are not line-anchored (e.g. the
+        # whole email collapsed onto one line by an HTML-to-text pass).
+        # Single pass over the body: the combined alternation finds every
+        # field in one scan instead of re-scanning the body per field.
+        # Matches may nest (one field's value can contain another field's
+        # label), so step just past each match start instead of using
+        # finditer's non-overlapping iteration.
+        customer_data = CustomerData()
+        search = _COMBINED_PATTERN.search
+        m = search(email_body)
+        while m:
+            key = _COMBINED_KEYS[m.lastindex]
+            if not getattr(customer_data, key):  # keep the first occurrence, like re.search did
+                value = m.group(m.lastindex)
+                if value:
+                    # Collapse/strip whitespace without the regex engine,
+                    # then normalize full-width colons.
+                    value = ' '.join(value.split()).replace('：', ':')
+                    if value:
+                        setattr(customer_data, key, value)
+            pos = m.start() + 1
+            m = search(email_body, pos)
+
+        self._log_parse_summary(customer_data)
         return customer_data
 
+    @staticmethod
+    def _log_parse_summary(customer_data):
+        """One INFO line per email instead of per-field chatter"""
+        filled = sum(1 for key in _PATTERNS if getattr(customer_data, key))
+        logger.info("📊 Parsed email: %d/%d fields (%s)", filled, len(_PATTERNS),
+                    customer_data.name or 'no name')
+
     def send_to_automation_webhook(self, customer_data, raw_body=None, message_id=None, subject=None):
         """Send parsed data to Lark webhook in JSON format"""
         # Prepare the JSON payload
         payload = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "timestamp": _now_str(),
             "message_id": message_id,
             "subject": subject,
             "customer_info": {
-                "name": customer_data.get('name', ''),
-                "furigana": customer_data.get('furigana', ''),
-                "email": customer_data.get('email', ''),
-                "phone": customer_data.get('phone', ''),
-                "age": customer_data.get('age', ''),
-                "postal_code": customer_data.get('postal_code', ''),
-                "address": customer_data.get('address', ''),
-                "monthly_rent": customer_data.get('monthly_rent', ''),
-                "monthly_payment": customer_data.get('monthly_payment', ''),
-                "comments": customer_data.get('comments', ''),
-                "trigger": customer_data.get('trigger', '')
+                "name": customer_data.name,
+                "furigana": customer_data.furigana,
+                "email": customer_data.email,
+                "phone": customer_data.phone,
+                "age": customer_data.age,
+                "postal_code": customer_data.postal_code,
+                "address": customer_data.address,
+                "monthly_rent": customer_data.monthly_rent,
+                "monthly_payment": customer_data.monthly_payment,
+                "comments": customer_data.comments,
+                "trigger": customer_data.trigger
             },
             "reservation_info": {
-                "date": customer_data.get('reservation_date', ''),
-                "time": customer_data.get('reservation_time', '')
+                "date": customer_data.reservation_date,
+                "time": customer_data.reservation_time
             },
             "event_info": {
-                "name": customer_data.get('event_name', ''),
-                "date": customer_data.get('event_date', ''),
-                "time": customer_data.get('event_time', ''),
-                "venue": customer_data.get('venue', ''),
-                "url": customer_data.get('url', '')
+                "name": customer_data.event_name,
+                "date": customer_data.event_date,
+                "time": customer_data.event_time,
+                "venue": customer_data.venue,
+                "url": customer_data.url
             },
             "store_info": {
-                "name": customer_data.get('store_name', ''),
-                "address": customer_data.get('store_address', ''),
-                "business_hours": customer_data.get('business_hours', ''),
-                "closed_days": customer_data.get('closed_days', '')
+                "name": customer_data.store_name,
+                "address": customer_data.store_address,
+                "business_hours": customer_data.business_hours,
+                "closed_days": customer_data.closed_days
             }
         }
 
         try:
-            print(f"📤 Sending to webhook: {AUTOMATION_WEBHOOK_URL}")
-            resp = requests.post(AUTOMATION_WEBHOOK_URL, json=payload, timeout=15)
+            logger.debug("📤 Sending to webhook: %s", AUTOMATION_WEBHOOK_URL)
+            if orjson is not None:
+                resp = self.webhook_session.post(
+                    AUTOMATION_WEBHOOK_URL,
+                    data=orjson.dumps(payload),
+                    headers={'Content-Type': 'application/json'},
+                    timeout=15
+                )
+            else:
+                resp = self.webhook_session.post(AUTOMATION_WEBHOOK_URL, json=payload, timeout=15)
             if 200 <= resp.status_code < 300:
-                print(f"✅ Successfully sent data to Lark webhook! Status: {resp.status_code}")
+                logger.info("✅ Sent data to Lark webhook (status %s)", resp.status_code)
                 return True
             else:
-                print(f"❌ Webhook returned {resp.status_code}: {resp.text}")
+                logger.error("❌ Webhook returned %s: %s", resp.status_code, resp.text)
                 return False
         except Exception as e:
-            print(f"❌ Error posting to webhook: {e}")
+            logger.error("❌ Error posting to webhook: %s", e)
             return False
 
     def process_specific_email(self, message_id):
         """Process a single email by ID"""
         if message_id in self.processed_messages:
-            print(f"⏭️  Already processed {message_id}")
+            logger.debug("⏭️  Already processed %s", message_id)
             return False
         
         if not self.gmail_service:
-            print("❌ Gmail service unavailable")
+            logger.error("❌ Gmail service unavailable")
             return False
 
         try:
-            print(f"📧 Processing email {message_id}...")
-            msg = self.gmail_service.users().messages().get(userId='me', id=message_id).execute()
-            
+            logger.debug("📧 Processing email %s...", message_id)
+            # Subject-only metadata fetch first: for non-registration mail
+            # (the common case) the full MIME payload never leaves Gmail.
+            meta = self.gmail_service.users().messages().get(
+                userId='me', id=message_id, format='metadata',
+                metadataHeaders=['Subject'], fields='id,payload/headers').execute()
+            subject = self._subject_of(meta)
+            if REGISTRATION_SUBJECT not in subject:
+                logger.debug("📪 Skipping %s - not a registration email", message_id)
+                return False
+            msg = self.gmail_service.users().messages().get(
+                userId='me', id=message_id, fields=MESSAGE_FIELDS).execute()
+        except Exception as e:
+            logger.error("❌ Error fetching email %s: %s", message_id, e)
+            return False
+
+        return self._process_message(message_id, msg)
+
+    @staticmethod
+    def _subject_of(msg):
+        """Pull the Subject header out of a (possibly metadata-only) message"""
+        for h in msg.get('payload', {}).get('headers', []):
+            if h.get('name') == 'Subject':
+                return h.get('value', '')
+        return ''
+
+    def _process_message(self, message_id, msg):
+        """Parse an already-fetched Gmail message and send it to the webhook"""
+        try:
             # Extract headers
             headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
             subject = headers.get('Subject', '')
             from_email = headers.get('From', '')
             date = headers.get('Date', '')
             
-            print(f"📨 Subject: {subject}")
-            print(f"👤 From: {from_email}")
+            logger.debug("📨 Subject: %s / From: %s", subject, from_email)
             
             # Check if this is the target email
-            if 'イベントの参加お申し込みがありました' not in subject:
-                print(f"📪 Skipping - not a registration email")
+            if REGISTRATION_SUBJECT not in subject:
+                logger.debug("📪 Skipping %s - not a registration email", message_id)
                 return False
 
             # Extract body
             body = self.extract_email_body(msg)
             if not body:
-                print("⚠️  No body content found")
+                logger.warning("⚠️  No body content found in %s", message_id)
                 return False
 
             # Parse customer info
             customer_data = self.parse_customer_info(body)
             
             # Check if we got valid data
-            if not customer_data.get('name') and not customer_data.get('email'):
-                print("⚠️  Could not extract customer information")
+            if not customer_data.name and not customer_data.email:
+                logger.warning("⚠️  Could not extract customer information from %s", message_id)
                 # Still try to send what we have
             
             # Send to webhook immediately
@@ -343,63 +724,123 @@ class EmailProcessor:
             
             if success:
                 self.processed_messages.add(message_id)
-                print(f"✅ Successfully processed and sent email {message_id}")
-                print(f"👤 Customer: {customer_data.get('name', 'Unknown')}")
+                logger.info("✅ Processed email %s (customer: %s)", message_id, customer_data.name)
                 return True
             
             return False
 
         except Exception as e:
-            print(f"❌ Error processing email {message_id}: {e}")
+            logger.error("❌ Error processing email %s: %s", message_id, e)
             return False
 
+    def _batch_get(self, message_ids, **get_kwargs):
+        """Fetch many messages through Gmail's batch endpoint (100 ops/call)"""
+        fetched = {}
+
+        def collect(request_id, response, exception):
+            if exception is not None:
+                logger.error("❌ Error fetching email %s: %s", request_id, exception)
+            else:
+                fetched[request_id] = response
+
+        for start in range(0, len(message_ids), 100):
+            batch = self.gmail_service.new_batch_http_request(callback=collect)
+            for mid in message_ids[start:start + 100]:
+                batch.add(
+                    self.gmail_service.users().messages().get(
+                        userId='me', id=mid, **get_kwargs),
+                    request_id=mid
+                )
+            batch.execute()
+        return fetched
+
+    def _process_many(self, message_ids):
+        """Fetch a set of messages in batch and process them concurrently
+
+        I/O dominates here, so the fetches go through Gmail's batch
+        endpoint (100 ops per round-trip) and the resulting webhook posts
+        overlap on a thread pool over the pooled session — wall-clock is
+        roughly one post's latency instead of the sum.
+        """
+        to_check = [mid for mid in message_ids
+                    if mid not in self.processed_messages]
+
+        # Subject-only pass: full bodies are fetched just for the messages
+        # that are actually registration emails.
+        meta = self._batch_get(to_check, format='metadata',
+                               metadataHeaders=['Subject'],
+                               fields='id,payload/headers')
+        matching = []
+        for mid in to_check:
+            msg = meta.get(mid)
+            if not msg:
+                continue
+            if REGISTRATION_SUBJECT in self._subject_of(msg):
+                matching.append(mid)
+            else:
+                logger.debug("📪 Skipping %s - not a registration email", mid)
+
+        fetched = self._batch_get(matching, fields=MESSAGE_FIELDS)
+
+        pending = [mid for mid in matching if mid in fetched]
+        if len(pending) > 1:
+            results = self._webhook_pool.map(
+                lambda mid: self._process_message(mid, fetched[mid]),
+                pending
+            )
+            return [mid for mid, ok in zip(pending, results) if ok]
+        return [mid for mid in pending
+                if self._process_message(mid, fetched[mid])]
+
     def process_history_changes(self, start_history_id):
         """Process emails from history changes (used for push notifications)"""
         if not self.gmail_service or not start_history_id:
             return []
         
         try:
-            print(f"📜 Checking history from ID: {start_history_id}")
-            history = self.gmail_service.users().history().list(
-                userId='me',
-                startHistoryId=start_history_id,
-                labelId='INBOX',
-                historyTypes=['messageAdded']
-            ).execute()
-            
-            changes = history.get('history', [])
-            processed = []
-            
-            for change in changes:
-                added_messages = change.get('messagesAdded', [])
-                for msg_added in added_messages:
-                    message_id = msg_added['message']['id']
-                    if self.process_specific_email(message_id):
-                        processed.append(message_id)
-            
+            logger.info("📜 Checking history from ID: %s", start_history_id)
+            message_ids = []
+            new_history_id = None
+            page_token = None
+            while True:
+                history = self.gmail_service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    labelId='INBOX',
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token
+                ).execute()
+
+                message_ids.extend(
+                    msg_added['message']['id']
+                    for change in history.get('history', [])
+                    for msg_added in change.get('messagesAdded', []))
+                new_history_id = history.get('historyId') or new_history_id
+                page_token = history.get('nextPageToken')
+                if not page_token:
+                    break
+
+            processed = self._process_many(message_ids)
+
             # Update history ID
-            new_history_id = history.get('historyId')
-            if new_history_id:
-                self.history_id = new_history_id
-                with open('gmail_history.txt', 'w') as f:
-                    f.write(str(new_history_id))
+            self._save_history_id(new_history_id)
             
             return processed
             
         except Exception as e:
-            print(f"⚠️  Error processing history: {e}")
+            logger.warning("⚠️ Error processing history: %s", e)
             # Fall back to recent emails
             return self.get_recent_emails(minutes_back=5)
 
     def get_recent_emails(self, minutes_back=5):
         """Fallback: Search for recent emails"""
         if not self.gmail_service:
-            print("❌ Gmail service not available")
+            logger.error("❌ Gmail service not available")
             return []
         
         try:
-            query = f'subject:"イベントの参加お申し込みがありました" newer_than:{minutes_back}m'
-            print(f"🔍 Searching for emails from last {minutes_back} minutes...")
+            query = f'subject:"{REGISTRATION_SUBJECT}" newer_than:{minutes_back}m'
+            logger.info("🔍 Searching for emails from last %s minutes...", minutes_back)
             
             res = self.gmail_service.users().messages().list(
                 userId='me', 
@@ -408,30 +849,73 @@ class EmailProcessor:
             ).execute()
             
             messages = res.get('messages', [])
-            processed_ids = []
-            
-            print(f"📧 Found {len(messages)} matching emails")
-            
-            for m in messages:
-                mid = m.get('id')
-                if self.process_specific_email(mid):
-                    processed_ids.append(mid)
-            
-            return processed_ids
+
+            logger.info("📧 Found %s matching emails", len(messages))
+
+            return self._process_many([m['id'] for m in messages if m.get('id')])
             
         except Exception as e:
-            print(f"❌ Error retrieving messages: {e}")
+            logger.error("❌ Error retrieving messages: %s", e)
             return []
 
 # Initialize the email processor
 email_processor = EmailProcessor()
 
+# Background workers for push-notification processing: Pub/Sub retries
+# deliveries that are not acked within ~10s, so the webhook route hands
+# the Gmail/Lark work off and acks immediately.
+_notification_executor = ThreadPoolExecutor(max_workers=4)
+
+# In-process periodic jobs. These used to live in a separate scheduler
+# worker that triggered processing over loopback HTTP; a daemon thread
+# removes that process and its HTTP + JSON round trip per run. The
+# catch-up sweep is idempotent thanks to the processed-message store,
+# and the watch re-register keeps push notifications alive (watches
+# expire after 7 days).
+_SWEEP_INTERVAL = int(os.getenv('SWEEP_INTERVAL_MINUTES', '15')) * 60
+_WATCH_RENEW_INTERVAL = 24 * 3600
+
+def _scheduler_loop():
+    """Periodic catch-up sweep + daily watch renewal"""
+    last_renew = time.monotonic()
+    while True:
+        time.sleep(_SWEEP_INTERVAL)
+        try:
+            email_processor.get_recent_emails(
+                minutes_back=_SWEEP_INTERVAL // 60 + 5)
+        except Exception as e:
+            logger.error("💥 Scheduled sweep failed: %s", e)
+        if time.monotonic() - last_renew >= _WATCH_RENEW_INTERVAL:
+            try:
+                email_processor.renew_watch()
+                last_renew = time.monotonic()
+            except Exception as e:
+                logger.error("💥 Watch renewal failed: %s", e)
+
+threading.Thread(target=_scheduler_loop, daemon=True).start()
+
+def _handle_notification(history_id):
+    """Run the actual email processing for one push notification"""
+    try:
+        if history_id and email_processor.history_id:
+            # Process only new messages since last history ID
+            email_processor.process_history_changes(email_processor.history_id)
+        else:
+            # First notification since startup with no stored history id:
+            # fall back to a search once, then seed the id from the push
+            # so every later notification takes the history path.
+            email_processor.get_recent_emails(minutes_back=2)
+            if history_id and not email_processor.history_id:
+                email_processor.history_id = history_id
+    except Exception as e:
+        logger.error("❌ Background notification processing failed: %s", e)
+
 # --- Flask Routes ---
 @app.route('/')
 def home():
     return jsonify({
         "status": "✅ Automatic Gmail Parser Active",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": _now_str(),
         "webhook_url": AUTOMATION_WEBHOOK_URL,
         "processed_count": len(email_processor.processed_messages),
         "endpoints": {
@@ -450,7 +934,7 @@ def health_check():
     
     return jsonify({
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": _now_str(),
         "gmail": gmail_status,
         "processed_emails": len(email_processor.processed_messages),
         "webhook_configured": bool(AUTOMATION_WEBHOOK_URL),
@@ -463,92 +947,76 @@ def gmail_webhook():
     Main webhook endpoint for Gmail push notifications via Pub/Sub
     This is where the magic happens - instant email processing!
     """
-    print("\n" + "="*50)
-    print("🔔 INSTANT NOTIFICATION RECEIVED!")
-    print("="*50)
-    
+    logger.info("🔔 Notification received at %s", _now_str())
+
     try:
-        data = request.get_json(silent=True)
+        # Parse the body directly: skips Flask's mimetype sniffing and,
+        # with orjson, the stdlib json object walk.
+        try:
+            data = _loads(request.get_data(cache=False))
+        except ValueError:
+            data = None
         if not data:
-            print("❌ No JSON in request")
+            logger.warning("❌ No JSON in request")
             return "Bad Request", 400
         
-        # Log the notification
-        print(f"📬 Notification received at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
         # Pub/Sub message format
         if 'message' in data:
             message = data['message']
-            
+            history_id = None
+
             # Decode the message data
             if 'data' in message:
-                raw_data = message['data']
-                decoded = base64.b64decode(raw_data).decode('utf-8')
-                
                 try:
-                    gmail_data = json.loads(decoded)
-                    print(f"📨 Gmail notification data: {gmail_data}")
-                    
-                    # Get history ID from the notification
+                    # Both json.loads and orjson.loads take bytes, so the
+                    # decoded payload never needs a str intermediate.
+                    gmail_data = _loads(base64.b64decode(message['data']))
+                    logger.debug("📨 Gmail notification data: %s", gmail_data)
                     history_id = gmail_data.get('historyId')
-                    if history_id and email_processor.history_id:
-                        # Process only new messages since last history ID
-                        processed = email_processor.process_history_changes(email_processor.history_id)
-                    else:
-                        # Fallback to recent emails
-                        processed = email_processor.get_recent_emails(minutes_back=2)
-                    
-                except json.JSONDecodeError:
-                    # If not JSON, still process recent emails
-                    processed = email_processor.get_recent_emails(minutes_back=2)
-            else:
-                # No data in message, process recent
-                processed = email_processor.get_recent_emails(minutes_back=2)
-            
-            # Acknowledge the Pub/Sub message
-            return jsonify({
-                "status": "success",
-                "processed": len(processed),
-                "timestamp": datetime.now().isoformat()
-            }), 200
-        
+                except ValueError:
+                    pass  # fall through to the recent-emails scan
+
+            # Ack immediately; the Gmail fetches and Lark posts run on the
+            # background pool so Pub/Sub's ack deadline never triggers a
+            # duplicate redelivery of this notification.
+            _notification_executor.submit(_handle_notification, history_id)
+            # Pub/Sub only checks the status code; skip the JSON envelope.
+            return 'OK', 200
+
         # Not a Pub/Sub message format, but still try to process
-        processed = email_processor.get_recent_emails(minutes_back=5)
-        return jsonify({
-            "status": "processed",
-            "count": len(processed)
-        }), 200
-        
+        _notification_executor.submit(_handle_notification, None)
+        return 'OK', 200
+
     except Exception as e:
-        print(f"❌ Webhook error: {e}")
+        logger.error("❌ Webhook error: %s", e)
         # Even on error, try to process emails
         try:
-            email_processor.get_recent_emails(minutes_back=5)
-        except:
+            _notification_executor.submit(_handle_notification, None)
+        except Exception:
             pass
         return jsonify({"error": str(e)}), 500
 
 @app.route('/process-now', methods=['GET', 'POST'])
 def manual_process():
     """Manually trigger email processing (useful for testing)"""
-    print("\n📧 Manual processing triggered...")
+    logger.info("📧 Manual processing triggered...")
     processed = email_processor.get_recent_emails(minutes_back=60)
     return jsonify({
         "status": "success",
         "processed_count": len(processed),
         "processed_ids": list(processed),
-        "timestamp": datetime.now().isoformat()
+        "timestamp": _now_str()
     })
 
 @app.route('/renew-watch', methods=['POST'])
 def renew_watch():
     """Renew Gmail watch subscription (watches expire after 7 days)"""
-    print("\n🔄 Renewing Gmail watch...")
+    logger.info("🔄 Renewing Gmail watch...")
     email_processor.renew_watch()
     return jsonify({
         "status": "success",
         "message": "Gmail watch renewed",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": _now_str()
     })
 
 @app.route('/test-parse', methods=['POST'])
@@ -559,7 +1027,7 @@ def test_parse():
         return jsonify({"error": "Please POST JSON with 'email_body' field"}), 400
     
     parsed = email_processor.parse_customer_info(data['email_body'])
-    
+
     # Test sending to webhook if requested
     if data.get('send_to_webhook'):
         success = email_processor.send_to_automation_webhook(
@@ -569,11 +1037,11 @@ def test_parse():
             subject="Test Parse"
         )
         return jsonify({
-            "parsed": parsed,
+            "parsed": asdict(parsed),
             "webhook_sent": success
         })
-    
-    return jsonify({"parsed": parsed})
+
+    return jsonify({"parsed": asdict(parsed)})
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -582,6 +1050,7 @@ if __name__ == '__main__':
     print(f"📮 Webhook URL: {AUTOMATION_WEBHOOK_URL}")
     print(f"🔔 Push notifications: {'Enabled' if PUBSUB_TOPIC_NAME else 'Disabled'}")
     print("="*50 + "\n")
-    
-    # Run the Flask app
+
+    # Local development only — production runs under gunicorn (see Procfile):
+    #   gunicorn --workers 4 --worker-class gthread --threads 8 app:app
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -8,8 +8,30 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from email.mime.text import MIMEText
+from email.utils import parsedate_to_datetime
 import re
 
+# Partial-response mask for message fetches: headers, body data and the
+# part tree are all the parser and attachment walk need — no snippets,
+# label ids or size estimates over the wire. An unqualified 'parts'
+# keeps the full nested tree.
+_MESSAGE_FIELDS = 'id,payload(mimeType,headers,body/data,parts)'
+
+# Compiled once at import: this runs per From/To header, and keeping it
+# at module scope skips the re cache lookup on every call.
+_EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+')
+
+# extract_body truncates to 5000 chars; 5000 chars of UTF-8 fit in at
+# most 20000 bytes, i.e. ~26667 base64 chars. Decoding only that prefix
+# keeps MB-scale inline parts from being fully decoded and thrown away.
+_B64_DECODE_CAP = 26668 + (4 - 26668 % 4) % 4
+
+def _decode_body_data(data: str) -> str:
+    """Base64-decode a body part, reading only what truncation keeps"""
+    if len(data) > _B64_DECODE_CAP:
+        data = data[:_B64_DECODE_CAP]
+    return base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+
 class EmailProcessor:
     def __init__(self, credentials_file: str, token_file: str, scopes: List[str]):
         self.credentials_file = credentials_file
@@ -22,10 +44,15 @@ class EmailProcessor:
         """Initialize Gmail API service"""
         creds = None
         
-        # Load existing token
+        # Load existing token (JSON; pickle only as legacy fallback for
+        # tokens written by older versions)
         if os.path.exists(self.token_file):
-            with open(self.token_file, 'rb') as token:
-                creds = pickle.load(token)
+            try:
+                creds = Credentials.from_authorized_user_file(
+                    self.token_file, self.scopes)
+            except ValueError:
+                with open(self.token_file, 'rb') as token:
+                    creds = pickle.load(token)
                 
         # If there are no (valid) credentials available, let the user log in
         if not creds or not creds.valid:
@@ -36,32 +63,65 @@ class EmailProcessor:
                     self.credentials_file, self.scopes)
                 creds = flow.run_local_server(port=0)
                 
-            # Save the credentials for the next run
-            with open(self.token_file, 'wb') as token:
-                pickle.dump(creds, token)
+            # Save the credentials for the next run; atomic replace so a
+            # crash mid-write never leaves a corrupt token
+            tmp = self.token_file + '.tmp'
+            with open(tmp, 'w') as token:
+                token.write(creds.to_json())
+            os.replace(tmp, self.token_file)
                 
-        self.service = build('gmail', 'v1', credentials=creds)
+        # static_discovery uses the discovery document bundled with the
+        # client library instead of fetching it over HTTPS at startup
+        try:
+            self.service = build('gmail', 'v1', credentials=creds,
+                                 static_discovery=True)
+        except TypeError:
+            # Older google-api-python-client without the kwarg
+            self.service = build('gmail', 'v1', credentials=creds)
         print("✓ Gmail API service initialized successfully")
         
-    def get_unread_emails(self, target_email: str) -> List[Dict[str, Any]]:
-        """Fetch unread emails sent to the target address"""
+    def get_unread_emails(self, target_email: str,
+                          newer_than: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fetch unread emails sent to the target address
+
+        newer_than takes a Gmail-style age like '1d' or '6h'; the date
+        filter prunes the candidate set server-side before subject/label
+        matching, keeping list() responses small.
+        """
         try:
             # Search for unread emails to the target address
             query = f'to:{target_email} is:unread'
+            if newer_than:
+                query += f' newer_than:{newer_than}'
             results = self.service.users().messages().list(
                 userId='me',
                 q=query,
-                maxResults=50
+                maxResults=50,
+                fields='messages/id,nextPageToken'
             ).execute()
             
             messages = results.get('messages', [])
             emails = []
-            
-            for message in messages:
-                email_data = self.get_email_details(message['id'])
+
+            # One batched round trip for the detail fetches instead of
+            # one HTTPS call per message (the batch endpoint caps at 100
+            # sub-requests, so chunk defensively).
+            def collect(request_id, response, exception):
+                if exception is not None:
+                    print(f"✗ Error getting email details: {exception}")
+                    return
+                email_data = self.parse_message(response)
                 if email_data:
                     emails.append(email_data)
-                    
+
+            for start in range(0, len(messages), 100):
+                batch = self.service.new_batch_http_request(callback=collect)
+                for message in messages[start:start + 100]:
+                    batch.add(self.service.users().messages().get(
+                        userId='me', id=message['id'],
+                        fields=_MESSAGE_FIELDS))
+                batch.execute()
+
             print(f"✓ Found {len(emails)} unread emails")
             return emails
             
@@ -74,13 +134,22 @@ class EmailProcessor:
         try:
             message = self.service.users().messages().get(
                 userId='me',
-                id=message_id
+                id=message_id,
+                fields=_MESSAGE_FIELDS
             ).execute()
-            
+            return self.parse_message(message)
+
+        except Exception as e:
+            print(f"✗ Error getting email details: {e}")
+            return None
+
+    def parse_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Build the email_data dict from an already-fetched message"""
+        try:
             # Extract headers
             headers = message['payload'].get('headers', [])
             email_data = {
-                'email_id': message_id,
+                'email_id': message['id'],
                 'sender': '',
                 'recipient': '',
                 'subject': '',
@@ -117,97 +186,97 @@ class EmailProcessor:
             
     def extract_email_address(self, email_string: str) -> str:
         """Extract email address from string like 'Name <email@domain.com>'"""
-        match = re.search(r'[\w\.-]+@[\w\.-]+', email_string)
+        match = _EMAIL_RE.search(email_string)
         return match.group(0) if match else email_string
         
     def parse_date(self, date_string: str) -> str:
         """Parse email date to ISO format"""
+        # The stdlib RFC 2822 parser handles every Date: variant the old
+        # strptime ladder covered (and the ones it silently missed) in a
+        # single pass instead of up to three format attempts per header.
         try:
-            # Remove timezone info for simplicity
-            date_string = re.sub(r'\s*\([^)]*\)', '', date_string)
-            date_string = re.sub(r'\s*[+-]\d{4}$', '', date_string)
-            
-            # Try multiple date formats
-            formats = [
-                '%a, %d %b %Y %H:%M:%S',
-                '%d %b %Y %H:%M:%S',
-                '%a, %d %b %Y %H:%M:%S %Z'
-            ]
-            
-            for fmt in formats:
-                try:
-                    dt = datetime.strptime(date_string.strip(), fmt)
-                    return dt.isoformat()
-                except:
-                    continue
-                    
-            return datetime.now().isoformat()
-            
-        except Exception as e:
+            return parsedate_to_datetime(date_string).isoformat()
+        except (TypeError, ValueError) as e:
             print(f"Date parsing error: {e}")
             return datetime.now().isoformat()
             
     def extract_body(self, payload: Dict) -> str:
         """Extract email body from payload"""
-        body = ''
-        
-        def get_text_from_part(part):
-            if part.get('mimeType') == 'text/plain':
-                data = part['body'].get('data', '')
-                if data:
-                    return base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-            return ''
-            
-        # Check if it's a simple message
-        if 'body' in payload and payload['body'].get('data'):
-            body = base64.urlsafe_b64decode(
-                payload['body']['data']).decode('utf-8', errors='ignore')
-        
-        # Check parts for multipart messages
-        elif 'parts' in payload:
-            for part in payload['parts']:
+        # Simple (non-multipart) message
+        if payload.get('body', {}).get('data'):
+            body = _decode_body_data(payload['body']['data'])
+        else:
+            # Iterative walk over the MIME tree: real Gmail messages nest
+            # multipart/* arbitrarily deep, which the old two-level loop missed.
+            chunks = []
+            total = 0
+            stack = list(reversed(payload.get('parts', [])))
+            while stack:
+                part = stack.pop()
                 if part.get('mimeType') == 'text/plain':
-                    body += get_text_from_part(part)
-                elif 'parts' in part:
-                    for subpart in part['parts']:
-                        body += get_text_from_part(subpart)
-                        
+                    data = part.get('body', {}).get('data', '')
+                    if data:
+                        chunk = _decode_body_data(data)
+                        chunks.append(chunk)
+                        total += len(chunk)
+                        if total > 5000:
+                            # Truncation below drops the rest anyway
+                            break
+                parts = part.get('parts')
+                if parts:
+                    stack.extend(reversed(parts))
+            body = ''.join(chunks)
+
         # Truncate if too long
         if len(body) > 5000:
             body = body[:5000] + "... [truncated]"
-            
+
         return body.strip()
         
     def get_attachment_names(self, payload: Dict) -> str:
         """Get list of attachment filenames"""
         attachments = []
-        
-        def check_part_for_attachment(part):
+
+        # Iterative walk, matching extract_body: the old two-level loop
+        # missed attachments nested more than two multiparts deep.
+        stack = list(reversed(payload.get('parts', [])))
+        while stack:
+            part = stack.pop()
             filename = part.get('filename', '')
             if filename:
                 attachments.append(filename)
-                
-        # Check main parts
-        if 'parts' in payload:
-            for part in payload['parts']:
-                check_part_for_attachment(part)
-                if 'parts' in part:
-                    for subpart in part['parts']:
-                        check_part_for_attachment(subpart)
-                        
+            parts = part.get('parts')
+            if parts:
+                stack.extend(reversed(parts))
+
         return ', '.join(attachments) if attachments else 'None'
         
     def mark_as_read(self, message_id: str) -> bool:
         """Mark an email as read"""
+        return self.mark_many_as_read([message_id])
+
+    def mark_many_as_read(self, message_ids: List[str]) -> bool:
+        """Mark a batch of emails as read with batchModify
+
+        One call clears UNREAD on up to 1000 messages, so callers should
+        accumulate ids over a processing run instead of modifying one
+        message at a time.
+        """
+        if not message_ids:
+            return True
+
         try:
-            self.service.users().messages().modify(
-                userId='me',
-                id=message_id,
-                body={'removeLabelIds': ['UNREAD']}
-            ).execute()
-            print(f"✓ Marked email {message_id} as read")
+            for start in range(0, len(message_ids), 1000):
+                self.service.users().messages().batchModify(
+                    userId='me',
+                    body={
+                        'ids': message_ids[start:start + 1000],
+                        'removeLabelIds': ['UNREAD']
+                    }
+                ).execute()
+            print(f"✓ Marked {len(message_ids)} email(s) as read")
             return True
             
         except Exception as e:
-            print(f"✗ Error marking email as read: {e}")
+            print(f"✗ Error marking emails as read: {e}")
             return False
\ No newline at end of file
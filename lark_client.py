@@ -1,9 +1,43 @@
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Any, Dict, List, Optional
 import time
 
+# Optional C-extension JSON codec for Lark request/response bodies —
+# the record payloads are Japanese-heavy and orjson encodes/decodes
+# them several times faster. Falls back to stdlib json when absent.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _dumps = orjson.dumps  # returns bytes, ready for the wire
+    _loads = orjson.loads
+else:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+# Cached token survives process restarts so we don't re-auth on every start
+TOKEN_CACHE_FILE = 'lark_token.json'
+
+# Record columns copied verbatim from parsed email data into Lark Base.
+# Kept at module scope so per-record dict building is one comprehension.
+_RECORD_FIELDS = (
+    "email_id",
+    "sender",
+    "recipient",
+    "subject",
+    "body",
+    "received_date",
+    "attachments",
+)
+
 class LarkClient:
     def __init__(self, app_id: str, app_secret: str, base_token: str, table_id: str):
         self.app_id = app_id
@@ -13,31 +47,70 @@ class LarkClient:
         self.base_url = "https://open.larksuite.com/open-apis"
         self.access_token = None
         self.token_expiry = 0
-        
+        # One keep-alive session for every Lark call; the auth header is
+        # set once per token refresh instead of rebuilt per request.
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504)
+            )
+        ))
+        self.session.headers.update({"Content-Type": "application/json"})
+        self._load_cached_token()
+        if self.access_token:
+            self.session.headers["Authorization"] = f"Bearer {self.access_token}"
+
+    def _load_cached_token(self):
+        """Load a previously saved access token if it is still valid"""
+        if not os.path.exists(TOKEN_CACHE_FILE):
+            return
+        try:
+            with open(TOKEN_CACHE_FILE, 'r') as f:
+                cached = json.load(f)
+            if cached.get('expiry', 0) - 300 > time.time():
+                self.access_token = cached.get('token')
+                self.token_expiry = cached['expiry']
+                print("✓ Reusing cached tenant access token")
+        except Exception as e:
+            print(f"⚠ Could not load cached token: {e}")
+
+    def _save_cached_token(self):
+        """Persist the current token so restarts skip re-auth"""
+        try:
+            with open(TOKEN_CACHE_FILE, 'w') as f:
+                json.dump({'token': self.access_token, 'expiry': self.token_expiry}, f)
+        except Exception as e:
+            print(f"⚠ Could not save token cache: {e}")
+
     def get_tenant_access_token(self) -> str:
         """Get or refresh tenant access token"""
         current_time = time.time()
-        
+
         # Check if token is still valid (with 5 minute buffer)
         if self.access_token and current_time < (self.token_expiry - 300):
             return self.access_token
-            
+
         url = f"{self.base_url}/auth/v3/tenant_access_token/internal"
-        headers = {"Content-Type": "application/json"}
         data = {
             "app_id": self.app_id,
             "app_secret": self.app_secret
         }
-        
+
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self.session.post(url, data=_dumps(data))
             response.raise_for_status()
-            result = response.json()
+            result = _loads(response.content)
             
             if result.get("code") == 0:
                 self.access_token = result["tenant_access_token"]
                 # Token expires in 2 hours (7200 seconds)
                 self.token_expiry = current_time + result.get("expire", 7200)
+                self.session.headers["Authorization"] = f"Bearer {self.access_token}"
+                self._save_cached_token()
                 print(f"✓ Tenant access token obtained successfully")
                 return self.access_token
             else:
@@ -47,34 +120,27 @@ class LarkClient:
             print(f"✗ Error getting tenant access token: {e}")
             raise
             
-    def create_record(self, record_data: Dict[str, Any]) -> Optional[str]:
-        """Create a new record in Lark Base table"""
-        token = self.get_tenant_access_token()
-        
+    def create_record(self, record_data: Dict[str, Any],
+                      processed_at: Optional[str] = None) -> Optional[str]:
+        """Create a new record in Lark Base table
+
+        processed_at lets batch callers stamp a whole run with one
+        datetime.now() instead of one per record.
+        """
+        self.get_tenant_access_token()
+
         url = f"{self.base_url}/bitable/v1/apps/{self.base_token}/tables/{self.table_id}/records"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
+
         # Format the fields for Lark Base
-        fields = {
-            "email_id": record_data.get("email_id", ""),
-            "sender": record_data.get("sender", ""),
-            "recipient": record_data.get("recipient", ""),
-            "subject": record_data.get("subject", ""),
-            "body": record_data.get("body", ""),
-            "received_date": record_data.get("received_date", ""),
-            "attachments": record_data.get("attachments", ""),
-            "processed_at": datetime.now().isoformat()
-        }
-        
+        fields = {key: record_data.get(key, "") for key in _RECORD_FIELDS}
+        fields["processed_at"] = processed_at or datetime.now().isoformat()
+
         data = {"fields": fields}
         
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self.session.post(url, data=_dumps(data))
             response.raise_for_status()
-            result = response.json()
+            result = _loads(response.content)
             
             if result.get("code") == 0:
                 record_id = result["data"]["record"]["record_id"]
@@ -88,16 +154,102 @@ class LarkClient:
             print(f"✗ Error creating record: {e}")
             return None
             
+    def create_records(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Create multiple records with a single batch_create call
+
+        A burst of N emails becomes one HTTPS round trip instead of N;
+        the endpoint accepts up to 1000 records per call, so larger
+        batches are chunked transparently.
+        """
+        if not records:
+            return []
+
+        self.get_tenant_access_token()
+
+        url = f"{self.base_url}/bitable/v1/apps/{self.base_token}/tables/{self.table_id}/records/batch_create"
+
+        processed_at = datetime.now().isoformat()
+        record_ids = []
+        for start in range(0, len(records), 1000):
+            chunk = records[start:start + 1000]
+            payload = {
+                "records": [
+                    {"fields": {**{key: record.get(key, "") for key in _RECORD_FIELDS},
+                                "processed_at": processed_at}}
+                    for record in chunk
+                ]
+            }
+
+            try:
+                response = self.session.post(url, data=_dumps(payload))
+                response.raise_for_status()
+                result = _loads(response.content)
+
+                if result.get("code") == 0:
+                    created = result["data"]["records"]
+                    record_ids.extend(r["record_id"] for r in created)
+                    print(f"✓ Batch created {len(created)} records")
+                else:
+                    print(f"✗ Failed to batch create records: {result.get('msg')}")
+
+            except Exception as e:
+                print(f"✗ Error batch creating records: {e}")
+
+        return record_ids
+
+    def check_duplicates_bulk(self, email_ids: List[str]) -> set:
+        """Find which of the given email_ids already exist in the base
+
+        One search request with an `in` filter replaces a per-id POST,
+        so a 50-email batch pays one round trip before the inserts.
+        """
+        if not email_ids:
+            return set()
+
+        self.get_tenant_access_token()
+
+        url = f"{self.base_url}/bitable/v1/apps/{self.base_token}/tables/{self.table_id}/records/search"
+
+        data = {
+            "filter": {
+                "conjunction": "and",
+                "conditions": [
+                    {
+                        "field_name": "email_id",
+                        "operator": "in",
+                        "value": list(email_ids)
+                    }
+                ]
+            },
+            "page_size": 500
+        }
+
+        try:
+            response = self.session.post(url, data=_dumps(data))
+            response.raise_for_status()
+            result = _loads(response.content)
+
+            if result.get("code") == 0:
+                existing = {item["fields"].get("email_id")
+                            for item in result["data"].get("items", [])}
+                existing.discard(None)
+                if existing:
+                    print(f"⚠ {len(existing)} of {len(email_ids)} emails already in base")
+                return existing
+            else:
+                print(f"✗ Error checking duplicates: {result.get('msg')}")
+                return set()
+
+        except Exception as e:
+            print(f"✗ Error checking duplicates: {e}")
+            return set()
+
     def check_duplicate(self, email_id: str) -> bool:
         """Check if email already exists in the base"""
-        token = self.get_tenant_access_token()
-        
+        self.get_tenant_access_token()
+
         url = f"{self.base_url}/bitable/v1/apps/{self.base_token}/tables/{self.table_id}/records/search"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
+
         # Search for existing email_id
         data = {
             "filter": {
@@ -113,9 +265,9 @@ class LarkClient:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self.session.post(url, data=_dumps(data))
             response.raise_for_status()
-            result = response.json()
+            result = _loads(response.content)
             
             if result.get("code") == 0:
                 has_duplicate = result["data"]["total"] > 0
@@ -15,33 +15,33 @@ def process_emails():
         # Get the base URL from environment or use localhost for testing
         base_url = os.getenv('BASE_URL', 'http://localhost:5000')
         
-        logger.info(f"🔄 Starting automatic email processing...")
+        logger.info("🔄 Starting automatic email processing...")
         response = requests.get(f'{base_url}/process-emails', timeout=60)
         
-        logger.info(f"📊 Processing status: {response.status_code}")
+        logger.info("📊 Processing status: %s", response.status_code)
         
         if response.status_code == 200:
             result = response.json()
             processed_count = result.get('processed_emails', 0)
             success_count = result.get('successful_stores', 0)
             
-            logger.info(f"✅ SUCCESS: Processed {processed_count} emails, stored {success_count} successfully")
+            logger.info("✅ SUCCESS: Processed %s emails, stored %s successfully", processed_count, success_count)
             
             # Log details of processed emails
             if result.get('results'):
                 for email_result in result['results']:
                     customer_name = email_result.get('customer_name', 'Unknown')
                     stored = '✅' if email_result.get('stored_successfully') else '❌'
-                    logger.info(f"  {stored} Customer: {customer_name}")
+                    logger.info("  %s Customer: %s", stored, customer_name)
         else:
-            logger.error(f"❌ Processing failed with status {response.status_code}: {response.text}")
+            logger.error("❌ Processing failed with status %s: %s", response.status_code, response.text)
             
     except requests.exceptions.Timeout:
         logger.error("⏰ Request timed out - email processing took too long")
     except requests.exceptions.ConnectionError:
         logger.error("🔌 Connection error - unable to reach email processing service")
     except Exception as e:
-        logger.error(f"💥 Unexpected error during email processing: {str(e)}")
+        logger.error("💥 Unexpected error during email processing: %s", e)
 
 def health_check():
     """Check system health every hour"""
@@ -55,15 +55,15 @@ def health_check():
             gmail_status = result.get('gmail', 'unknown')
             lark_status = result.get('lark', 'unknown')
             
-            logger.info(f"❤️  Health check: {status} | Gmail: {gmail_status} | Lark: {lark_status}")
+            logger.info("❤️  Health check: %s | Gmail: %s | Lark: %s", status, gmail_status, lark_status)
             
             if status != 'healthy':
-                logger.warning(f"⚠️  System not healthy: {result}")
+                logger.warning("⚠️  System not healthy: %s", result)
         else:
-            logger.warning(f"⚠️  Health check failed: {response.status_code}")
+            logger.warning("⚠️  Health check failed: %s", response.status_code)
             
     except Exception as e:
-        logger.error(f"💔 Health check error: {str(e)}")
+        logger.error("💔 Health check error: %s", e)
 
 def main():
     logger.info("🚀 Email Processing Scheduler Started")
@@ -86,7 +86,7 @@ def main():
     except KeyboardInterrupt:
         logger.info("🛑 Scheduler stopped by user")
     except Exception as e:
-        logger.error(f"💥 Scheduler crashed: {str(e)}")
+        logger.error("💥 Scheduler crashed: %s", e)
         # Wait before potentially restarting
         time.sleep(300)  # Wait 5 minutes before exit
 
@@ -15,7 +15,15 @@ class Config:
     # Environment
     ENVIRONMENT = os.getenv('ENVIRONMENT', 'development').strip()
     TEST_EMAIL = os.getenv('TEST_EMAIL', 'utosabu.adhikari@allagi.jp').strip()
-    
+
+    # Env vars are resolved once at import, so validity is a constant;
+    # health probes read this instead of re-deriving it per hit
+    IS_VALID = bool(LARK_WEBHOOK_URL)
+
+    @classmethod
+    def is_valid(cls):
+        return cls.IS_VALID
+
     @classmethod
     def validate(cls):
         """Validate required configuration"""
@@ -1,107 +1,144 @@
 import re
 import logging
-from datetime import datetime
-from typing import Dict, Optional
+from dataclasses import dataclass
+from typing import Any
+
+from .utils import now_iso
 
 logger = logging.getLogger(__name__)
 
+# Fixed-schema record for one parsed email. Slots keep per-email memory
+# small and make field access attribute loads instead of dict hashing;
+# attribute names double as the webhook payload keys.
+@dataclass(slots=True)
+class ParsedEmail:
+    event_name: str = ""
+    event_date: str = ""
+    event_time: str = ""
+    event_venue: str = ""
+    event_url: str = ""
+    customer_name: str = ""
+    customer_furigana: str = ""
+    customer_email: str = ""
+    customer_phone: str = ""
+    customer_age: Any = ""  # int once parsed, "" when absent
+    monthly_rent: str = ""
+    monthly_payment: str = ""
+    postal_code: str = ""
+    address: str = ""
+    timestamp: str = ""
+
 class EmailParser:
-    """Parse Japanese event registration emails and extract structured data"""
-    
+    """Parse Japanese event registration emails into ParsedEmail records"""
+
     def __init__(self):
-        # Field mapping to match your Lark Base table exactly
+        raw_patterns = {
+            'event_name': r'イベント名\s*:\s*(.+?)(?=\n|開催日)',
+            'event_date': r'開催日\s*:\s*(.+?)(?=\n|時間)',
+            'event_time': r'時間\s*:\s*(.+?)(?=\n|会場)',
+            'event_venue': r'会場\s*:\s*(.+?)(?=\n|URL)',
+            'event_url': r'URL\s*:\s*(.+?)(?=\n|=)',
+            'customer_name': r'お名前\s*:\s*(.+?)(?=\n|フリガナ)',
+            'customer_furigana': r'フリガナ\s*:\s*(.+?)(?=\n|メールアドレス)',
+            'customer_email': r'メールアドレス\s*:\s*(.+?)(?=\n|電話番号)',
+            'customer_phone': r'電話番号\s*:\s*(.+?)(?=\n|年齢)',
+            'customer_age': r'年齢\s*:\s*(.+?)(?=\n|毎月の家賃)',
+            'monthly_rent': r'毎月の家賃\s*:\s*(.+?)(?=\n|月々の返済額)',
+            'monthly_payment': r'月々の返済額\s*:\s*(.+?)(?=\n|郵便番号)',
+            'postal_code': r'郵便番号\s*:\s*(.+?)(?=\n|ご住所)',
+            'address': r'ご住所\s*:\s*(.+?)(?=\n|ご意見)',
+        }
+        # Compile once here: re.search with a raw string re-enters re's
+        # pattern cache (a keyed dict lookup) per field per email.
+        # No DOTALL: values are single lines, and without it a missing
+        # lookahead label can't send .+? backtracking across the body.
         self.patterns = {
-            'Event Name': r'イベント名\s*:\s*(.+?)(?=\n|開催日)',
-            'Event Date': r'開催日\s*:\s*(.+?)(?=\n|時間)',
-            'Event Time': r'時間\s*:\s*(.+?)(?=\n|会場)',
-            'Event Venue': r'会場\s*:\s*(.+?)(?=\n|URL)',
-            'Event URL': r'URL\s*:\s*(.+?)(?=\n|=)',
-            'Customer Name': r'お名前\s*:\s*(.+?)(?=\n|フリガナ)',
-            'Customer Furigana': r'フリガナ\s*:\s*(.+?)(?=\n|メールアドレス)',
-            'Customer Email': r'メールアドレス\s*:\s*(.+?)(?=\n|電話番号)',
-            'Customer Phone': r'電話番号\s*:\s*(.+?)(?=\n|年齢)',
-            'Customer Age': r'年齢\s*:\s*(.+?)(?=\n|毎月の家賃)',
-            'Monthly Rent': r'毎月の家賃\s*:\s*(.+?)(?=\n|月々の返済額)',
-            'Monthly Payment': r'月々の返済額\s*:\s*(.+?)(?=\n|郵便番号)',
-            'Postal Code': r'郵便番号\s*:\s*(.+?)(?=\n|ご住所)',
-            'Address': r'ご住所\s*:\s*(.+?)(?=\n|ご意見)',
+            name: re.compile(pattern, re.MULTILINE)
+            for name, pattern in raw_patterns.items()
+        }
+        # First run of digits only: '35歳' -> 35, without gluing
+        # unrelated runs together the way a digit-filter join would
+        self._age_re = re.compile(r'(\d+)')
+        # Every field is a 'label : value' line, so one MULTILINE pass
+        # with a label alternation replaces 14 full-body searches.
+        self._label_map = {
+            'イベント名': 'event_name',
+            '開催日': 'event_date',
+            '時間': 'event_time',
+            '会場': 'event_venue',
+            'URL': 'event_url',
+            'お名前': 'customer_name',
+            'フリガナ': 'customer_furigana',
+            'メールアドレス': 'customer_email',
+            '電話番号': 'customer_phone',
+            '年齢': 'customer_age',
+            '毎月の家賃': 'monthly_rent',
+            '月々の返済額': 'monthly_payment',
+            '郵便番号': 'postal_code',
+            'ご住所': 'address',
         }
-    
-    def parse_email(self, email_content: str) -> Dict[str, str]:
-        """
-        Parse email content and extract structured data
-        
-        Args:
-            email_content: Raw email content in Japanese
-            
-        Returns:
-            Dictionary with extracted data matching Lark Base fields
-        """
-        logger.info("Starting email parsing...")
-        
-        extracted_data = {}
-        
-        # Add timestamp
-        extracted_data['timestamp'] = datetime.now().isoformat()
-        
-        # Extract each field using regex patterns
-        for field_name, pattern in self.patterns.items():
-            try:
-                match = re.search(pattern, email_content, re.MULTILINE | re.DOTALL)
-                if match:
-                    value = match.group(1).strip()
-                    # Clean up the value
-                    value = self._clean_text(value)
-                    extracted_data[field_name] = value
-                    logger.debug(f"Extracted {field_name}: {value}")
-                else:
-                    extracted_data[field_name] = ""
-                    logger.warning(f"Could not extract {field_name}")
-            except Exception as e:
-                logger.error(f"Error extracting {field_name}: {str(e)}")
-                extracted_data[field_name] = ""
-        
-        # Special handling for age (extract number only)
-        if extracted_data.get('Customer Age'):
-            age_match = re.search(r'(\d+)', extracted_data['Customer Age'])
+
+    def parse_email(self, email_content: str, ts: str = None) -> ParsedEmail:
+        # ts lets the request handler stamp parse + webhook send with one
+        # timestamp instead of one per call
+        parsed = ParsedEmail(timestamp=ts or now_iso())
+
+        # Single pass over the body; the labels are fixed literals, so a
+        # str.partition + dict lookup per line beats the regex engine
+        # entirely. First occurrence of a label wins.
+        for line in email_content.split('\n'):
+            head, sep, tail = line.partition(':')
+            if not sep or '：' in head:
+                head, sep, tail = line.partition('：')
+            field_name = self._label_map.get(head.strip())
+            if field_name and not getattr(parsed, field_name):
+                # str.split collapses all whitespace runs in one C pass
+                value = ' '.join(tail.split())
+                if value:
+                    setattr(parsed, field_name, value)
+                    logger.debug("Extracted %s: %s", field_name, value)
+
+        # Fallback for bodies whose label/value structure did not survive
+        # as one-per-line (e.g. collapsed by HTML-to-text conversion).
+        # Gated on the required fields, not on the scan finding nothing:
+        # a partially mangled body can line-match some labels while the
+        # required ones sit mid-line. Line-scan values are kept.
+        if not (parsed.customer_name or parsed.customer_email):
+            for field_name, pattern in self.patterns.items():
+                if getattr(parsed, field_name):
+                    continue
+                try:
+                    match = pattern.search(email_content)
+                    if match:
+                        # Same C-level collapse as the fast path above
+                        value = ' '.join(match.group(1).split())
+                        setattr(parsed, field_name, value)
+                        logger.debug("Extracted %s: %s", field_name, value)
+                except Exception as e:
+                    logger.error("Error extracting %s: %s", field_name, e)
+
+        # Special handling for age
+        if parsed.customer_age:
+            age_match = self._age_re.search(parsed.customer_age)
             if age_match:
-                extracted_data['Customer Age'] = int(age_match.group(1))
-        
-        logger.info(f"Email parsing completed. Extracted {len(extracted_data)} fields.")
-        return extracted_data
-    
-    def _clean_text(self, text: str) -> str:
-        """Clean extracted text by removing extra whitespace and newlines"""
-        if not text:
-            return ""
-        
-        # Remove extra whitespace and newlines
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        
-        return text
-    
-    def validate_required_fields(self, data: Dict[str, str]) -> bool:
-        """
-        Validate that required fields are present
-        
-        Args:
-            data: Extracted data dictionary
-            
-        Returns:
-            True if all required fields are present
-        """
-        required_fields = [
-            'Customer Name', 'Customer Email', 'Customer Phone'
-        ]
-        
-        missing_fields = []
-        for field in required_fields:
-            if not data.get(field) or str(data.get(field)).strip() == "":
-                missing_fields.append(field)
-        
-        if missing_fields:
-            logger.error(f"Missing required fields: {', '.join(missing_fields)}")
-            return False
-        
-        return True
\ No newline at end of file
+                parsed.customer_age = int(age_match.group(1))
+
+        logger.info("Email parsing completed.")
+        return parsed
+
+    def quick_required_check(self, email_content: str) -> bool:
+        # C-level substring tests for the three required labels; bodies
+        # that can't possibly validate skip the full parse entirely
+        return ('お名前' in email_content
+                and 'メールアドレス' in email_content
+                and '電話番号' in email_content)
+
+    def validate_required_fields(self, data: ParsedEmail) -> bool:
+        # Values are already stripped by the parser, so three attribute
+        # loads with short-circuiting cover the common (valid) case
+        if data.customer_name and data.customer_email and data.customer_phone:
+            return True
+        for field in ('customer_name', 'customer_email', 'customer_phone'):
+            if not getattr(data, field):
+                logger.error("Missing required field: %s", field)
+        return False
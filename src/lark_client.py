@@ -1,97 +1,107 @@
-import requests
+import json
 import logging
-from datetime import datetime
-from typing import Dict, Optional
-from .config import Config
+import time
+from dataclasses import asdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .email_parser import ParsedEmail
+from .utils import now_iso
 
 logger = logging.getLogger(__name__)
 
-class LarkWebhookClient:
-    """Simplified client that sends data to Lark Base webhook"""
-    
+# Optional C-extension JSON codec — much faster on the Japanese-heavy
+# payloads here. Falls back to stdlib json when unavailable.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _dumps = orjson.dumps  # returns bytes, ready for the wire
+else:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+class WebhookClient:
+    """Send parsed email records to the Lark Base automation webhook"""
+
     def __init__(self, webhook_url: str):
         self.webhook_url = webhook_url
-    
-    def send_to_lark_base(self, data: Dict[str, str]) -> bool:
-        """
-        Send data to Lark Base via webhook
-        
-        Args:
-            data: Dictionary containing the parsed email data
-            
-        Returns:
-            True if successful, False otherwise
-        """
+        # One keep-alive session: every post reuses the TCP+TLS
+        # connection to Lark instead of paying a fresh handshake.
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.2,
+                status_forcelist=(429, 500, 502, 503, 504)
+            )
+        ))
+        self.session.headers.update({'Content-Type': 'application/json'})
+        # (checked_at, result) for test_connection; load balancer probes
+        # hit /health every few seconds and each probe was a full POST
+        # to Lark, so the result is reused for a short TTL.
+        self._last_check = (0.0, False)
+
+    def send_to_lark_base(self, data: ParsedEmail, ts: str = None) -> bool:
         try:
-            # Prepare the data for Lark Base
-            webhook_data = {
-                "timestamp": datetime.now().isoformat(),
-                "event_name": data.get('Event Name', ''),
-                "event_date": data.get('Event Date', ''),
-                "event_time": data.get('Event Time', ''),
-                "event_venue": data.get('Event Venue', ''),
-                "event_url": data.get('Event URL', ''),
-                "customer_name": data.get('Customer Name', ''),
-                "customer_furigana": data.get('Customer Furigana', ''),
-                "customer_email": data.get('Customer Email', ''),
-                "customer_phone": data.get('Customer Phone', ''),
-                "customer_age": data.get('Customer Age', ''),
-                "monthly_rent": data.get('Monthly Rent', ''),
-                "monthly_payment": data.get('Monthly Payment', ''),
-                "postal_code": data.get('Postal Code', ''),
-                "address": data.get('Address', ''),
-            }
-            
-            # Remove empty fields
-            webhook_data = {k: v for k, v in webhook_data.items() if v}
-            
-            logger.info(f"Sending data to Lark Base webhook: {len(webhook_data)} fields")
-            logger.debug(f"Webhook data: {webhook_data}")
-            
-            # Send to Lark Base webhook
-            headers = {
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
+            # Prepare data for Lark Base: the ParsedEmail attribute names
+            # are the payload keys, single pass that only writes
+            # non-empty values
+            webhook_data = {"timestamp": ts or data.timestamp
+                            or now_iso()}
+            for key, value in asdict(data).items():
+                if value and key != 'timestamp':
+                    webhook_data[key] = value
+
+            logger.info("Sending %d fields to Lark Base webhook", len(webhook_data))
+
+            response = self.session.post(
                 self.webhook_url,
-                json=webhook_data,
-                headers=headers,
+                data=_dumps(webhook_data),
                 timeout=30
             )
-            
-            logger.info(f"Webhook response status: {response.status_code}")
-            
+
+            logger.info("Webhook response status: %s", response.status_code)
+
             if response.status_code == 200:
                 logger.info("Successfully sent data to Lark Base webhook")
                 return True
             else:
-                logger.error(f"Webhook failed: {response.status_code} - {response.text}")
+                logger.error("Webhook failed: %s - %s", response.status_code, response.text)
                 return False
-                
+
         except Exception as e:
-            logger.error(f"Failed to send data to webhook: {str(e)}")
+            logger.error("Failed to send data to webhook: %s", e)
             return False
-    
+
     def test_connection(self) -> bool:
-        """Test webhook connection with sample data"""
+        checked_at, result = self._last_check
+        if time.monotonic() - checked_at < 5.0:
+            return result
         try:
             test_data = {
                 "test": True,
-                "timestamp": datetime.now().isoformat(),
-                "customer_name": "Test User",
-                "customer_email": "test@example.com"
+                "timestamp": now_iso(),
+                "customer_name": "Test Connection"
             }
-            
-            response = requests.post(
+
+            response = self.session.post(
                 self.webhook_url,
-                json=test_data,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
+                data=_dumps(test_data),
+                timeout=10
             )
-            
-            return response.status_code == 200
-            
+
+            result = response.status_code == 200
+
         except Exception as e:
-            logger.error(f"Webhook test failed: {str(e)}")
-            return False
\ No newline at end of file
+            logger.error("Webhook test failed: %s", e)
+            result = False
+
+        self._last_check = (time.monotonic(), result)
+        return result
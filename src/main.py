@@ -1,10 +1,11 @@
+import gzip
+import hashlib
 import logging
 import json
 import os
-import re
 import sys
-from datetime import datetime
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 
 # Simple logging setup for production
 logging.basicConfig(
@@ -17,161 +18,61 @@ logger = logging.getLogger(__name__)
 # Import Flask (pure Python, no compilation)
 try:
     from flask import Flask, request, jsonify
-    import requests
-    from dotenv import load_dotenv
     logger.info("All dependencies imported successfully")
 except ImportError as e:
-    logger.error(f"Import error: {e}")
+    logger.error("Import error: %s", e)
     sys.exit(1)
 
-# Load environment variables
-load_dotenv()
+# One copy of each component: config, parser and webhook client live in
+# their own modules so nothing here is defined twice across the package.
+from .config import Config
+from .email_parser import EmailParser, ParsedEmail
+from .lark_client import WebhookClient
+from .utils import now_iso
 
-# Simple Configuration
-class Config:
-    LARK_WEBHOOK_URL = os.getenv('LARK_WEBHOOK_URL', '').strip()
-    ENVIRONMENT = os.getenv('ENVIRONMENT', 'development').strip()
-    TEST_EMAIL = os.getenv('TEST_EMAIL', 'utosabu.adhikari@allagi.jp').strip()
-    
-    @classmethod
-    def is_valid(cls):
-        return bool(cls.LARK_WEBHOOK_URL)
-
-# Email Parser Class
-class EmailParser:
-    def __init__(self):
-        self.patterns = {
-            'Event Name': r'イベント名\s*:\s*(.+?)(?=\n|開催日)',
-            'Event Date': r'開催日\s*:\s*(.+?)(?=\n|時間)',
-            'Event Time': r'時間\s*:\s*(.+?)(?=\n|会場)',
-            'Event Venue': r'会場\s*:\s*(.+?)(?=\n|URL)',
-            'Event URL': r'URL\s*:\s*(.+?)(?=\n|=)',
-            'Customer Name': r'お名前\s*:\s*(.+?)(?=\n|フリガナ)',
-            'Customer Furigana': r'フリガナ\s*:\s*(.+?)(?=\n|メールアドレス)',
-            'Customer Email': r'メールアドレス\s*:\s*(.+?)(?=\n|電話番号)',
-            'Customer Phone': r'電話番号\s*:\s*(.+?)(?=\n|年齢)',
-            'Customer Age': r'年齢\s*:\s*(.+?)(?=\n|毎月の家賃)',
-            'Monthly Rent': r'毎月の家賃\s*:\s*(.+?)(?=\n|月々の返済額)',
-            'Monthly Payment': r'月々の返済額\s*:\s*(.+?)(?=\n|郵便番号)',
-            'Postal Code': r'郵便番号\s*:\s*(.+?)(?=\n|ご住所)',
-            'Address': r'ご住所\s*:\s*(.+?)(?=\n|ご意見)',
-        }
-    
-    def parse_email(self, email_content: str) -> Dict[str, Any]:
-        extracted_data = {'timestamp': datetime.now().isoformat()}
-        
-        for field_name, pattern in self.patterns.items():
-            try:
-                match = re.search(pattern, email_content, re.MULTILINE | re.DOTALL)
-                if match:
-                    value = match.group(1).strip()
-                    value = re.sub(r'\s+', ' ', value).strip()
-                    extracted_data[field_name] = value
-                    logger.debug(f"Extracted {field_name}: {value}")
-                else:
-                    extracted_data[field_name] = ""
-            except Exception as e:
-                logger.error(f"Error extracting {field_name}: {e}")
-                extracted_data[field_name] = ""
-        
-        # Special handling for age
-        if extracted_data.get('Customer Age'):
-            age_match = re.search(r'(\d+)', extracted_data['Customer Age'])
-            if age_match:
-                extracted_data['Customer Age'] = int(age_match.group(1))
-        
-        logger.info(f"Email parsing completed. Extracted {len(extracted_data)} fields.")
-        return extracted_data
-    
-    def validate_required_fields(self, data: Dict[str, Any]) -> bool:
-        required_fields = ['Customer Name', 'Customer Email', 'Customer Phone']
-        
-        for field in required_fields:
-            if not data.get(field) or str(data.get(field)).strip() == "":
-                logger.error(f"Missing required field: {field}")
-                return False
-        
-        return True
+# Optional C-extension JSON codec for request parsing — much faster on
+# the Japanese-heavy payloads here. Falls back to stdlib json when
+# unavailable; both raise ValueError subclasses on bad input.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-# Webhook Client Class
-class WebhookClient:
-    def __init__(self, webhook_url: str):
-        self.webhook_url = webhook_url
-    
-    def send_to_lark_base(self, data: Dict[str, Any]) -> bool:
-        try:
-            # Prepare data for Lark Base
-            webhook_data = {
-                "timestamp": datetime.now().isoformat(),
-                "event_name": data.get('Event Name', ''),
-                "event_date": data.get('Event Date', ''),
-                "event_time": data.get('Event Time', ''),
-                "event_venue": data.get('Event Venue', ''),
-                "event_url": data.get('Event URL', ''),
-                "customer_name": data.get('Customer Name', ''),
-                "customer_furigana": data.get('Customer Furigana', ''),
-                "customer_email": data.get('Customer Email', ''),
-                "customer_phone": data.get('Customer Phone', ''),
-                "customer_age": data.get('Customer Age', ''),
-                "monthly_rent": data.get('Monthly Rent', ''),
-                "monthly_payment": data.get('Monthly Payment', ''),
-                "postal_code": data.get('Postal Code', ''),
-                "address": data.get('Address', ''),
-            }
-            
-            # Remove empty fields
-            webhook_data = {k: v for k, v in webhook_data.items() if v}
-            
-            logger.info(f"Sending {len(webhook_data)} fields to Lark Base webhook")
-            
-            response = requests.post(
-                self.webhook_url,
-                json=webhook_data,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            logger.info(f"Webhook response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                logger.info("Successfully sent data to Lark Base webhook")
-                return True
-            else:
-                logger.error(f"Webhook failed: {response.status_code} - {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Failed to send data to webhook: {str(e)}")
-            return False
-    
-    def test_connection(self) -> bool:
-        try:
-            test_data = {
-                "test": True,
-                "timestamp": datetime.now().isoformat(),
-                "customer_name": "Test Connection"
-            }
-            
-            response = requests.post(
-                self.webhook_url,
-                json=test_data,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
-            )
-            
-            return response.status_code == 200
-            
-        except Exception as e:
-            logger.error(f"Webhook test failed: {str(e)}")
-            return False
+_loads = orjson.loads if orjson is not None else json.loads
 
 # Initialize Flask app
 app = Flask(__name__)
 
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class _OrjsonProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    # Routes all jsonify/get_json calls through orjson
+    app.json = _OrjsonProvider(app)
+
 # Initialize components
 email_parser = EmailParser()
 webhook_client = None
 
+# Outbound Lark posts run here so the webhook handler can ack Lark Mail
+# immediately instead of holding the request open for up to 30s —
+# slow responses make Lark Mail retry, inflating load.
+_send_executor = ThreadPoolExecutor(max_workers=4)
+
+
+def _send_in_background(data: ParsedEmail, ts: str) -> None:
+    try:
+        if not webhook_client.send_to_lark_base(data, ts=ts):
+            logger.error("Background send to Lark Base failed")
+    except Exception as e:
+        logger.error("Background send error: %s", e)
+
 # Initialize webhook client if config is valid
 if Config.is_valid():
     webhook_client = WebhookClient(Config.LARK_WEBHOOK_URL)
@@ -189,9 +90,23 @@ def root():
         "framework": "Flask",
         "environment": Config.ENVIRONMENT,
         "webhook_configured": bool(webhook_client),
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     })
 
+@app.route('/livez', methods=['GET'])
+def liveness():
+    """Liveness probe: no side effects, just proof the process answers"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    """Readiness probe: cached upstream status, no outbound call per hit"""
+    webhook_ok = bool(webhook_client) and webhook_client.test_connection()
+    return jsonify({
+        "status": "ready" if webhook_ok else "not_ready",
+        "webhook_connection": webhook_ok
+    }), 200 if webhook_ok else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Detailed health check"""
@@ -210,7 +125,7 @@ def health_check():
         "webhook_error": webhook_error,
         "config_valid": Config.is_valid(),
         "environment": Config.ENVIRONMENT,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     })
 
 @app.route('/webhook/lark-mail', methods=['POST'])
@@ -222,13 +137,18 @@ def handle_lark_mail_webhook():
     try:
         logger.info("Received webhook request from Lark Mail")
         
-        # Get JSON data
-        webhook_data = request.get_json()
+        # Parse the body directly: skips Flask's mimetype sniffing and
+        # the cached-copy buffer request.get_json keeps around
+        try:
+            webhook_data = _loads(request.get_data(cache=False))
+        except ValueError:
+            webhook_data = None
         if not webhook_data:
             logger.warning("No JSON data received")
             return jsonify({"error": "No JSON data"}), 400
         
-        logger.info(f"Webhook data keys: {list(webhook_data.keys())}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Webhook data keys: %s", list(webhook_data.keys()))
         
         # Handle webhook verification
         if webhook_data.get('type') == 'url_verification':
@@ -238,7 +158,7 @@ def handle_lark_mail_webhook():
         
         # Handle mail events
         if webhook_data.get('type') != 'event_callback':
-            logger.info(f"Ignoring webhook type: {webhook_data.get('type')}")
+            logger.info("Ignoring webhook type: %s", webhook_data.get('type'))
             return jsonify({"status": "ignored", "message": "Not a mail event"})
         
         # Extract email content
@@ -250,63 +170,93 @@ def handle_lark_mail_webhook():
             logger.error("No email content found in webhook")
             return jsonify({"error": "No email content"}), 400
         
-        logger.info(f"Processing email from: {sender}")
-        logger.info(f"Email content length: {len(email_content)} characters")
+        logger.info("Processing email from: %s", sender)
+        logger.info("Email content length: %d characters", len(email_content))
+
+        # Reject bodies missing a required label before any parsing work
+        if not email_parser.quick_required_check(email_content):
+            logger.error("Email validation failed - missing required fields")
+            return jsonify({"error": "Missing required fields"}), 400
+
+        # One timestamp per request, shared by parse and webhook send
+        ts = now_iso()
         
         # Parse email content
-        extracted_data = email_parser.parse_email(email_content)
+        extracted_data = email_parser.parse_email(email_content, ts=ts)
         
         # Validate required fields
         if not email_parser.validate_required_fields(extracted_data):
             logger.error("Email validation failed - missing required fields")
             return jsonify({
                 "error": "Missing required fields",
-                "extracted_data": extracted_data
+                "extracted_data": asdict(extracted_data)
             }), 400
         
-        # Send data to Lark Base webhook
-        success = webhook_client.send_to_lark_base(extracted_data)
-        
-        if success:
-            customer_name = extracted_data.get('Customer Name', 'Unknown')
-            logger.info(f"Successfully processed email for customer: {customer_name}")
-            return jsonify({
-                "status": "success",
-                "message": "Email processed and data sent to Lark Base successfully",
-                "customer_name": customer_name,
-                "fields_extracted": len(extracted_data)
-            })
-        else:
-            logger.error("Failed to send data to Lark Base webhook")
-            return jsonify({
-                "error": "Failed to send data to Lark Base webhook"
-            }), 500
-            
+        # Hand the outbound post to the executor and ack immediately;
+        # Lark Mail only needs to know we accepted the event.
+        _send_executor.submit(_send_in_background, extracted_data, ts)
+
+        customer_name = extracted_data.customer_name or 'Unknown'
+        logger.info("Accepted email for customer: %s", customer_name)
+        return jsonify({
+            "status": "accepted",
+            "message": "Email parsed; delivery to Lark Base queued",
+            "customer_name": customer_name,
+            "fields_extracted": len(ParsedEmail.__slots__)
+        })
+
     except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
+        logger.error("Error processing webhook: %s", e)
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+def _raw_body() -> bytes:
+    """Request body bytes, transparently inflating gzipped payloads"""
+    raw = request.get_data(cache=False)
+    if request.headers.get('Content-Encoding') == 'gzip':
+        raw = gzip.decompress(raw)
+    return raw
+
+def _text_body() -> str:
+    return _raw_body().decode('utf-8', errors='replace')
+
+# Parse results keyed by body digest: smoke tests and dev watch loops
+# re-post the same sample email over and over, so an unchanged body
+# skips the parse pipeline entirely.
+_parse_cache = {}
+
 @app.route('/test/parse', methods=['POST'])
 def test_parse_email():
     """Test endpoint for parsing email content"""
     try:
-        email_content = request.get_data(as_text=True)
-        
-        if not email_content:
+        raw = _raw_body()
+
+        if not raw:
             return jsonify({"error": "No email content provided"}), 400
-        
+
+        digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        cached = _parse_cache.get(digest)
+        if cached is not None:
+            logger.info("Returning cached parse result")
+            return jsonify(cached)
+
+        email_content = raw.decode('utf-8', errors='replace')
+
         logger.info("Testing email parsing...")
         extracted_data = email_parser.parse_email(email_content)
-        
-        return jsonify({
+
+        payload = {
             "status": "success",
             "message": "Email parsed successfully",
-            "extracted_data": extracted_data,
-            "field_count": len(extracted_data)
-        })
-        
+            "extracted_data": asdict(extracted_data),
+            "field_count": len(ParsedEmail.__slots__)
+        }
+        if len(_parse_cache) >= 64:
+            _parse_cache.clear()
+        _parse_cache[digest] = payload
+        return jsonify(payload)
+
     except Exception as e:
-        logger.error(f"Error in test parse: {str(e)}")
+        logger.error("Error in test parse: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/test/full', methods=['POST'])
@@ -316,37 +266,39 @@ def test_full_workflow():
         return jsonify({"error": "Webhook client not initialized"}), 503
     
     try:
-        email_content = request.get_data(as_text=True)
-        
+        email_content = _text_body()
+
         if not email_content:
             return jsonify({"error": "No email content provided"}), 400
-        
+
         logger.info("Testing complete workflow...")
         
+        ts = now_iso()
+        
         # Parse email
-        extracted_data = email_parser.parse_email(email_content)
+        extracted_data = email_parser.parse_email(email_content, ts=ts)
         
         # Validate
         if not email_parser.validate_required_fields(extracted_data):
             return jsonify({
                 "status": "validation_failed",
                 "message": "Missing required fields",
-                "extracted_data": extracted_data
+                "extracted_data": asdict(extracted_data)
             }), 400
         
         # Send to Lark Base
-        success = webhook_client.send_to_lark_base(extracted_data)
+        success = webhook_client.send_to_lark_base(extracted_data, ts=ts)
         
         return jsonify({
             "status": "success" if success else "error",
             "message": "Complete workflow tested successfully" if success else "Failed to send to Lark Base",
-            "extracted_data": extracted_data,
-            "field_count": len(extracted_data),
+            "extracted_data": asdict(extracted_data),
+            "field_count": len(ParsedEmail.__slots__),
             "sent_to_lark": success
         })
         
     except Exception as e:
-        logger.error(f"Error in full workflow test: {str(e)}")
+        logger.error("Error in full workflow test: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # Error handlers
@@ -1,8 +1,25 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+import time
 from datetime import datetime
 
+# Per-second ISO timestamp cache shared by the app, parser and webhook
+# client: request stamps and status endpoints only need second
+# granularity, so skip a datetime allocation per call.
+_ts_cache = [0, '']
+
+def now_iso() -> str:
+    """Current local time in ISO format, cached per second."""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = datetime.fromtimestamp(t).isoformat()
+    return _ts_cache[1]
+
 def setup_logging():
     """Setup logging for production and development"""
     
@@ -17,18 +34,26 @@ def setup_logging():
             handlers=[logging.StreamHandler(sys.stdout)]
         )
     else:
-        # Local development - file and console
+        # Local development - file and console. Records go onto a queue
+        # and a background listener thread owns the real handlers, so
+        # request threads never block on a disk write.
         os.makedirs('logs', exist_ok=True)
         log_file = f"logs/app_{datetime.now().strftime('%Y%m%d')}.log"
-        
+
+        log_queue = queue.Queue(-1)
         logging.basicConfig(
             level=logging.INFO,
             format=log_format,
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler(sys.stdout)
-            ]
+            handlers=[logging.handlers.QueueHandler(log_queue)]
+        )
+        listener = logging.handlers.QueueListener(
+            log_queue,
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler(sys.stdout),
+            respect_handler_level=True
         )
+        listener.start()
+        atexit.register(listener.stop)
     
     # Quiet down some loggers
     logging.getLogger('uvicorn').setLevel(logging.WARNING)
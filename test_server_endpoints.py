@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Optional C-extension JSON codec, same fallback pattern as the app:
+# the parse-email response carries every extracted field and decodes
+# noticeably faster through orjson when it is installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+def _json(response):
+    return _loads(response.content)
+
+# One keep-alive session shared by every probe: the TCP connection to the
+# local server is reused across the health, detailed-health and parse
+# calls instead of paying socket setup + teardown per request.
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# (connect, read) timeout for every probe: localhost either accepts in
+# milliseconds or the server is down, so a failed run reports in under
+# a second instead of hanging on the ~21 s default; the read half
+# leaves room for the parse-email work.
+_TIMEOUT = (0.5, 10.0)
+
+base_url = f"http://localhost:{os.getenv('PORT', '8000')}"
+
+# Full response dumps only when asked for: in the default (CI) mode the
+# probes print just what they actually check.
+VERBOSE = os.getenv('TEST_VERBOSE', '') != ''
+
+# Same sample registration email used by test_email_parser.py
+sample_email = """[STYLE HOUSE] イベントの参加お申し込みがありました。 2025-09-03 06:39:19
+========================================
+イベント情報
+========================================
+イベント名      : 【西宮住宅展示場】見つけよう、理想のお家！AUTUMN FAIR開催? 9月も大人気「JIBのトートバッグ」をプレゼント♪
+開催日          : 2025年9月1日(月) - 9月15日(月)
+時間            : 09：30～18：00(水曜定休日)
+会場            : 兵庫県西宮市鞍掛町5-5
+URL             : https://www.taniue.jp/event/details_111.html
+========================================
+お客様情報
+========================================
+お名前            : 向山　隆志
+フリガナ          : ムカイヤマ　タカシ
+メールアドレス    : k884maria@gmail.com
+電話番号          : 08043947558
+年齢              : 35歳
+毎月の家賃       : 20万円
+月々の返済額      : 20万円
+郵便番号          : 〒662-0027
+ご住所            : 兵庫県2-37　夙川苦楽園口レジデンス302
+ご意見・ご質問等 : """
+
+# Encoded and compressed once at import: the POST body is the same
+# bytes on every run, so repeated invocations skip the full-body UTF-8
+# encode. Email text compresses well and level 1 is cheap; the server
+# inflates gzip bodies on the test endpoints.
+_EMAIL_BYTES = sample_email.encode('utf-8')
+_EMAIL_GZ = gzip.compress(_EMAIL_BYTES, compresslevel=1)
+
+# Fields whose extraction the parse probe verifies
+_CHECK_KEYS = frozenset(('customer_name', 'customer_email', 'event_name'))
+
+def test_server_endpoints():
+    print("Testing Server Endpoints...")
+    print("=" * 50)
+
+    # Fire all three probes at once — the Session pool is thread-safe
+    # and lends each worker its own connection — then report in order.
+    # Wall time becomes the slowest probe instead of the sum of three.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        f_live = executor.submit(_SESSION.head, f"{base_url}/",
+                                 timeout=_TIMEOUT)
+        f_health = executor.submit(_SESSION.get, f"{base_url}/health",
+                                   timeout=_TIMEOUT)
+        f_parse = executor.submit(
+            _SESSION.post,
+            f"{base_url}/test/parse",
+            data=_EMAIL_GZ,
+            headers={'Content-Type': 'text/plain; charset=utf-8',
+                     'Content-Encoding': 'gzip'},
+            timeout=_TIMEOUT
+        )
+
+    # 1. Liveness: only the status code matters here, so a HEAD skips
+    # the body serialization server-side and the JSON decode client-side
+    # (Flask answers HEAD on any GET route).
+    try:
+        response = f_live.result()
+        print(f"HEAD / -> {response.status_code}")
+    except Exception as e:
+        print(f"✗ Cannot connect to {base_url}: {e}")
+        return False
+
+    # 2. Detailed health check
+    try:
+        response = f_health.result()
+        print(f"GET /health -> {response.status_code}")
+        health_data = _json(response)
+        print(f"Lark connection: {health_data.get('webhook_connection')}")
+        if VERBOSE:
+            print(f"Response: {health_data}")
+    except Exception as e:
+        print(f"✗ Health check failed: {e}")
+
+    # 3. Parse the sample email through the server
+    try:
+        response = f_parse.result()
+        print(f"POST /test/parse -> {response.status_code}")
+        result = _json(response)
+        extracted = result.get('extracted_data', {})
+        # One C-level view intersection instead of three membership
+        # tests; print joins the parts itself, so the loop builds no
+        # throwaway f-strings
+        for key in sorted(extracted.keys() & _CHECK_KEYS):
+            if extracted[key]:
+                print('  ', key, ': ', extracted[key], sep='')
+        if VERBOSE:
+            print(f"Response: {result}")
+        print(f"Fields extracted: {result.get('field_count')}")
+    except Exception as e:
+        print(f"✗ Parse test failed: {e}")
+
+    print("=" * 50)
+    return True
+
+if __name__ == "__main__":
+    test_server_endpoints()